@@ -11,11 +11,10 @@ class ArrowAnimator:
         if not self.battlefield.animation_frames:
             return
         
-        # Collect all unique troop IDs that ever existed in any frame
-        all_troop_ids = set()
-        for frame in self.battlefield.animation_frames:
-            for troop in frame['troops']:
-                all_troop_ids.add(troop['id'])
+        # Collect all troop IDs that ever existed in any frame
+        troop_timelines = self.battlefield.get_troop_timelines()[0]
+        all_troop_ids = [troop_id for troop_id, timeline in enumerate(troop_timelines)
+                         if any(timeline)]
         
         print(f"Creating arrows for {len(all_troop_ids)} unique troops that existed during simulation")
         
@@ -62,11 +61,9 @@ class ArrowAnimator:
         
         size = int(scale * 0.7)
         last_arrow_pos = None
+        troop_timelines, arrow_timelines = self.battlefield.get_troop_timelines()
         
-        for frame in self.battlefield.animation_frames:
-            # Find this troop in the current frame
-            troop_data = self._find_troop_in_frame(frame, troop_id)
-            
+        for troop_data, troop_arrow in zip(troop_timelines[troop_id], arrow_timelines[troop_id]):
             if not troop_data:
                 # Troop doesn't exist (died) - use last known position or stay hidden
                 if last_arrow_pos:
@@ -78,9 +75,6 @@ class ArrowAnimator:
                                                colors, stroke_styles, opacity_values, arrowhead_points)
                 continue
             
-            # Find if this troop has an arrow in this frame
-            troop_arrow = self._find_arrow_in_frame(frame, troop_id)
-            
             if troop_arrow:
                 # Troop has a target - show arrow
                 arrow_pos = self._calculate_arrow_position(troop_arrow, scale, size)
@@ -110,20 +104,6 @@ class ArrowAnimator:
             'arrowhead_points': arrowhead_points
         }
     
-    def _find_troop_in_frame(self, frame, troop_id):
-        """Find troop data in a frame by ID"""
-        for troop in frame['troops']:
-            if troop['id'] == troop_id:
-                return troop
-        return None
-    
-    def _find_arrow_in_frame(self, frame, troop_id):
-        """Find arrow data in a frame by troop ID"""
-        for arrow in frame['arrows']:
-            if arrow['from_id'] == troop_id:
-                return arrow
-        return None
-    
     def _calculate_arrow_position(self, troop_arrow, scale, size):
         """Calculate arrow position and appearance from arrow data"""
         from_x = troop_arrow['from_pos'][0] * scale
@@ -0,0 +1,250 @@
+import numpy as np
+from battlefield import DIRECTIONS, STAGNATION_THRESHOLD
+
+
+def _pack(rows, fill):
+    """Stack per-battle lists of different lengths into one padded (battles, slots) array"""
+    width = max((len(row) for row in rows), default=0)
+    return np.array([list(row) + [fill] * (width - len(row)) for row in rows]).reshape(len(rows), width)
+
+
+class BatchedBattles:
+    """
+    Advances many independent headless battles at once.
+
+    Troop state lives in (battle, slot) arrays, where slot j is the j-th troop
+    of a battle's troop list. A tick walks the slots in order, as
+    BattleField.update walks its list, and handles that slot in every battle
+    with one set of array operations. Same-tick ordering is unchanged: a troop
+    sees the moves and damage of the troops before it, dead troops stay
+    targetable until the next tick, and nuke_dead keeps its habit of skipping
+    the troop after each one it removes. Each battle draws from its own
+    battlefield's RNG, in the same order, so a seeded battle plays out exactly
+    as BattleField.run(render=False) would play it.
+
+    Distances are compared squared, which matches BattleField for the integer
+    positions and ranges every builder uses. Sleeping troops
+    (idle_wake_interval) are not supported.
+    """
+
+    def __init__(self, battlefields):
+        for battlefield in battlefields:
+            if battlefield.idle_wake_interval or battlefield.sleeping:
+                raise ValueError("BatchedBattles does not support sleeping troops (idle_wake_interval)")
+            if battlefield.update_mode != 'sequential':
+                raise ValueError("BatchedBattles only runs the sequential update mode")
+            if battlefield.movement != 'direct':
+                raise ValueError("BatchedBattles only supports direct movement")
+
+        self.battlefields = list(battlefields)
+        self.slots = [list(battlefield.troops) for battlefield in self.battlefields]
+        self.rngs = [battlefield.rng for battlefield in self.battlefields]
+        self.tick = np.array([battlefield.tick for battlefield in self.battlefields])
+
+        def stat(name, fill=0):
+            return _pack([[getattr(troop, name) for troop in troops] for troops in self.slots], fill)
+
+        self.x = _pack([[troop.position[0] for troop in troops] for troops in self.slots], 0)
+        self.y = _pack([[troop.position[1] for troop in troops] for troops in self.slots], 0)
+        self.health = stat('health')
+        self.attack = stat('attack')
+        self.speed = stat('speed')
+        self.attack_range_sq = stat('attack_range') ** 2
+        self.vision_range_sq = stat('vision_range') ** 2
+        self.cooldown = stat('cooldown')
+        self.cooldown_timer = stat('cooldown_timer')
+        self.team = stat('team', False).astype(bool)
+        self.active = _pack([[True] * len(troops) for troops in self.slots], False).astype(bool)
+        self.outcomes = [None] * len(self.battlefields)
+
+    def get_team_counts(self):
+        """(team True counts, team False counts) per battle, like BattleField.get_team_counts"""
+        return (self.active & self.team).sum(axis=1), (self.active & ~self.team).sum(axis=1)
+
+    def nuke_dead(self, battles):
+        """Remove dead troops from the given battles, skipping the troop after each removal"""
+        skip = np.zeros(len(battles), dtype=bool)
+        for slot in range(self.active.shape[1]):
+            in_list = self.active[battles, slot]
+            removed = in_list & ~skip & (self.health[battles, slot] <= 0)
+            self.active[battles[removed], slot] = False
+            skip = np.where(in_list, removed, skip)
+
+    def update(self, running):
+        """Advance every battle where running is True by one tick"""
+        battles = np.flatnonzero(running)
+        self.tick[battles] += 1
+        self.nuke_dead(battles)
+
+        # Slots already handled this tick block their cells
+        processed = np.zeros(self.active.shape, dtype=bool)
+
+        for slot in range(self.active.shape[1]):
+            b = np.flatnonzero(running & self.active[:, slot])
+            if not b.size:
+                continue
+            original_x = self.x[b, slot]
+            original_y = self.y[b, slot]
+            new_x = original_x.copy()
+            new_y = original_y.copy()
+
+            # Closest enemy still in the list; ties go to the lowest slot, i.e. the lowest id
+            dx = self.x[b] - original_x[:, None]
+            dy = self.y[b] - original_y[:, None]
+            dist_sq = dx * dx + dy * dy
+            enemy = self.active[b] & (self.team[b] != self.team[b, slot][:, None]) & (dist_sq > 0)
+            dist_sq = np.where(enemy, dist_sq, np.inf)
+            target = dist_sq.argmin(axis=1)
+            best = dist_sq[np.arange(b.size), target]
+            found = best <= self.vision_range_sq[b, slot]
+
+            # Idle: wander in a random direction
+            for i in np.flatnonzero(~found):
+                direction = DIRECTIONS[self.rngs[b[i]].randint(0, 3)]
+                new_x[i] += self.speed[b[i], slot] * direction[0]
+                new_y[i] += self.speed[b[i], slot] * direction[1]
+
+            # In range: attack when the cooldown allows, otherwise wait
+            in_range = found & (best <= self.attack_range_sq[b, slot])
+            attacking = in_range & (self.cooldown_timer[b, slot] == 0)
+            attackers = b[attacking]
+            self.cooldown_timer[attackers, slot] = self.cooldown[attackers, slot] + 1
+            np.subtract.at(self.health, (attackers, target[attacking]), self.attack[attackers, slot])
+
+            # In vision: step towards the enemy on both axes
+            moving = found & ~in_range
+            speed = self.speed[b, slot]
+            step_x = np.where(self.x[b, target] - original_x > 0, speed, -speed)
+            step_y = np.where(self.y[b, target] - original_y > 0, speed, -speed)
+            new_x = np.where(moving, original_x + step_x, new_x)
+            new_y = np.where(moving, original_y + step_y, new_y)
+
+            # Collisions: step back one cell towards the original position on a random axis
+            collided = (processed[b] & (self.x[b] == new_x[:, None]) & (self.y[b] == new_y[:, None])).any(axis=1)
+            for i in np.flatnonzero(collided):
+                if self.rngs[b[i]].choice([0, 1]) == 0:
+                    new_x[i] += 1 if original_x[i] > new_x[i] else -1
+                else:
+                    new_y[i] += 1 if original_y[i] > new_y[i] else -1
+
+            self.x[b, slot] = new_x
+            self.y[b, slot] = new_y
+            processed[b, slot] = True
+
+            cooling = b[self.cooldown_timer[b, slot] > 0]
+            self.cooldown_timer[cooling, slot] -= 1
+
+    def predict_winner(self, battles):
+        """Vectorised BattleField.predict_winner: lists of winner (or None) and confidence for the given battles"""
+        alive = self.active[battles] & (self.health[battles] > 0)
+        health = {}
+        damage = {}
+        present = {}
+        per_tick = self.attack[battles] / (self.cooldown[battles] + 1)
+        for team in (True, False):
+            members = alive & (self.team[battles] == team)
+            present[team] = members.any(axis=1)
+            health[team] = np.where(members, self.health[battles], 0).sum(axis=1)
+            # cumsum adds left to right like the Python loop, so the float sums match exactly
+            damage[team] = np.cumsum(np.where(members, per_tick, 0.0), axis=1)[:, -1]
+
+        strength_true = health[True] * damage[True]
+        strength_false = health[False] * damage[False]
+        true_favoured = strength_true > strength_false
+        favourite_strength = np.where(true_favoured, strength_true, strength_false)
+        underdog_strength = np.where(true_favoured, strength_false, strength_true)
+        underdog_damage = np.where(true_favoured, damage[False], damage[True])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = favourite_strength / underdog_strength
+            confidence = np.where(underdog_damage == 0, 1.0, ratio / (1 + ratio))
+
+        winners = []
+        confidences = []
+        for i in range(len(battles)):
+            if present[True][i] and present[False][i]:
+                if strength_true[i] == strength_false[i]:
+                    winners.append(None)
+                    confidences.append(0.0)
+                else:
+                    winners.append(bool(true_favoured[i]))
+                    confidences.append(float(confidence[i]))
+            elif present[True][i] or present[False][i]:
+                winners.append(bool(present[True][i]))
+                confidences.append(1.0)
+            else:
+                winners.append(None)
+                confidences.append(0.0)
+        return winners, confidences
+
+    def run(self, max_iterations=None, stagnation_threshold=STAGNATION_THRESHOLD, predict_confidence=None):
+        """
+        Play every battle out with the end conditions of BattleField.run.
+
+        Each battle stops on its own; finished battles are masked out of later
+        ticks. Final troop state and outcomes are written back to the
+        battlefields, so they can be inspected as if each had been run alone.
+
+        Returns:
+            List of outcome dicts, one per battle (see BattleField.run)
+        """
+        count = len(self.battlefields)
+        running = np.ones(count, dtype=bool)
+        outcomes = [{'reason': 'max_iterations', 'winner': None, 'predicted': False, 'confidence': 0.0}
+                    for _ in range(count)]
+        last_counts = None
+        unchanged = np.zeros(count, dtype=int)  # Ticks the team counts have stayed the same, this one included
+        iteration = 0
+
+        while running.any():
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+
+            self.update(running)
+            true_count, false_count = self.get_team_counts()
+            counts = np.stack([true_count, false_count], axis=1)
+            if last_counts is None:
+                unchanged = np.ones(count, dtype=int)
+            else:
+                unchanged = np.where((counts == last_counts).all(axis=1), unchanged + 1, 1)
+            last_counts = counts
+
+            for b in np.flatnonzero(running & (unchanged >= stagnation_threshold)):
+                outcomes[b]['reason'] = 'stagnation'
+                outcomes[b]['iterations'] = iteration + 1
+                running[b] = False
+
+            for b in np.flatnonzero(running & ((true_count == 0) | (false_count == 0))):
+                outcomes[b].update(reason='elimination', winner=bool(true_count[b] > 0), confidence=1.0,
+                                   iterations=iteration + 1)
+                running[b] = False
+
+            if predict_confidence is not None and running.any():
+                battles = np.flatnonzero(running)
+                for b, winner, confidence in zip(battles, *self.predict_winner(battles)):
+                    if winner is not None and confidence >= predict_confidence:
+                        outcomes[b].update(reason='predicted', winner=winner, predicted=True,
+                                           confidence=confidence, iterations=iteration + 1)
+                        running[b] = False
+
+            iteration += 1
+
+        # Battles stopped by max_iterations report one more, as BattleField.run does
+        for b in np.flatnonzero(running):
+            outcomes[b]['iterations'] = iteration + 1
+
+        self.outcomes = outcomes
+        self.write_back()
+        return outcomes
+
+    def write_back(self):
+        """Copy the array state back into each battlefield and its troops"""
+        for b, battlefield in enumerate(self.battlefields):
+            troops = self.slots[b]
+            for slot, troop in enumerate(troops):
+                troop.position = (self.x[b, slot].item(), self.y[b, slot].item())
+                troop.health = self.health[b, slot].item()
+                troop.cooldown_timer = self.cooldown_timer[b, slot].item()
+            battlefield.troops = [troop for slot, troop in enumerate(troops) if self.active[b, slot]]
+            battlefield.tick = self.tick[b].item()
+            battlefield._chunks_dirty = True
+            battlefield.outcome = self.outcomes[b]
@@ -1,19 +1,29 @@
 import random
 import os
-import datetime
-import imageio
-import xml.etree.ElementTree as ET
-from png_renderer import PNGRenderer
-from svg_renderer import SVGRenderer
+import tempfile
+from collections import deque
+from renderers import create_renderer
+from frame_recording import DeltaFrameRecording, RingFrameRecording, KEYFRAME_INTERVAL, RING_FRAMES
 
 # (health, attack, speed, attack_range, vision_range, cooldown)
 BARBARIAN   = (100, 20, 1,  1, 100, 2)
 ARCHER      = (80 , 30, 2, 10, 100, 3)
 
+# Bump whenever simulation rules change, so cached results are invalidated
+ENGINE_VERSION = 1
+
 STAGNATION_THRESHOLD = 150 
+CHUNK_SIZE = 16  # Side length in cells of the spatial chunks used for targeting
+CHUNK_MIN_TROOPS = 300  # chunk_size='auto' starts chunking once a battle has this many troops
+MAX_IMAGE_SIZE = 8192  # Largest rendered side in pixels before a viewport is used
 DIRECTIONS = [(1, 0), (0, 1), (-1, 0), (0, -1)]
+FLOW_NEIGHBOURS = DIRECTIONS + [(1, 1), (-1, 1), (-1, -1), (1, -1)]  # 8-connected flow field steps
+FLOW_MARGIN_LAYERS = 2  # BFS layers kept going after the last of a team's troops is reached
+FLOW_WINDOW_MARGIN = 16  # Cells around a team's troops its flow field covers
 class Troop:
-    def __init__(self, type: tuple, position: tuple, team: bool):
+    def __init__(self, type: tuple, position: tuple, team: bool, unit=None):
+        # 'barbarian' or 'archer'; stats alone can't tell once a sweep has changed them
+        self.unit = unit or ('barbarian' if type[1] == BARBARIAN[1] else 'archer')
         self.max_health = type[0]
         self.health = type[0]
         self.attack = type[1]
@@ -24,43 +34,286 @@ class Troop:
         self.position = position
         self.cooldown_timer = 0
         self.team = team
+        self.id = None  # Dense integer id, assigned by BattleField.add_troop
 
-    def moveRandomly(self):
-        direction = DIRECTIONS[random.randint(0, 3)]
+    def moveRandomly(self, rng=random):
+        direction = DIRECTIONS[rng.randint(0, 3)]
         new_x = self.position[0] + self.speed * direction[0]
         new_y = self.position[1] + self.speed * direction[1]
         self.position = (new_x, new_y)
     
         
 class BattleField():
-    def __init__(self, width, height):
+    def __init__(self, width, height, chunk_size='auto', viewport=None, idle_wake_interval=None,
+                 seed=None, recording='full', keyframe_interval=KEYFRAME_INTERVAL, update_mode='sequential',
+                 keep_frames=RING_FRAMES, spill_dir=None, movement='direct'):
         self.width = width
         self.height = height
+        # Seeded battles get their own RNG; otherwise the global random module is used
+        self.seed = seed
+        self.rng = random.Random(seed) if seed is not None else random
+        
+        # 'sequential' updates troops one after another in list order, each seeing the
+        # changes made before it. 'simultaneous' has every troop decide from the previous
+        # tick's state and commits all damage and moves together (see simultaneous.py).
+        if update_mode not in ('sequential', 'simultaneous'):
+            raise ValueError(f"Unknown update mode: {update_mode!r}")
+        if update_mode == 'simultaneous' and idle_wake_interval:
+            raise ValueError("idle_wake_interval is not supported in simultaneous update mode")
+        self.update_mode = update_mode
+        # 'direct' steps each mover straight at the enemy its own search found. 'flow_field'
+        # builds one BFS field per team per tick and movers follow it (sequential mode only).
+        if movement not in ('direct', 'flow_field'):
+            raise ValueError(f"Unknown movement mode: {movement!r}")
+        if movement == 'flow_field' and update_mode != 'sequential':
+            raise ValueError("flow_field movement needs the sequential update mode")
+        self.movement = movement
+        # Key for the per-(tick, troop) random numbers of simultaneous mode
+        self.counter_key = None
+        if update_mode == 'simultaneous':
+            from simultaneous import counter_seed
+            self.counter_key = counter_seed(seed if seed is not None else self.rng.getrandbits(64))
         self.troops = []
+        self.troop_registry = []  # Every troop ever added, indexed by troop.id
         self.frame_counter = 1
-        self.animation_frames = []  # Store all frame data for SVG animation
+        self.tick = 0  # Number of update() calls so far
+        # Store all frame data for SVG animation. 'delta' recording keeps a keyframe
+        # every keyframe_interval frames and only the changes in between. 'ring' also
+        # drops all but the last keep_frames frames, spilling old keyframes to spill_dir.
+        if recording == 'full':
+            self.animation_frames = []
+        elif recording == 'delta':
+            self.animation_frames = DeltaFrameRecording(keyframe_interval)
+        elif recording == 'ring':
+            self.animation_frames = RingFrameRecording(keep_frames, keyframe_interval, spill_dir)
+        else:
+            raise ValueError(f"Unknown recording mode: {recording!r}")
+        self.frame_listeners = []  # Called with each frame's data as it is captured
+        # Told about every hit (hit(target, damage)) and every finished tick (end_tick(battlefield))
+        self.tick_observers = []
+        self.tick_stats = None  # Per-tick aggregates, see track_stats()
+        self.heatmap = None  # Occupancy and death locations, see track_heatmap()
+        self.outcome = None  # How the last run() ended, see run()
+        self._timelines_cache = None
+        
+        # Spatial chunks: team -> {(chunk_x, chunk_y): {troop_id: troop}}
+        # Empty chunks are dropped so searches never visit them.
+        # A chunk_size of None disables chunking and scans every troop. 'auto' scans
+        # every troop until CHUNK_MIN_TROOPS have been added, as the chunk bookkeeping
+        # costs more than it saves in smaller battles (sleeping always chunks).
+        self.auto_chunk = chunk_size == 'auto'
+        if self.auto_chunk:
+            chunk_size = CHUNK_SIZE if idle_wake_interval else None
+        self.chunk_size = chunk_size
+        self.chunks = {}
+        self._chunks_dirty = True
+        
+        # Idle troops with no enemy chunk in vision sleep until an enemy enters one
+        # of the chunks they watch, or for at most idle_wake_interval ticks.
+        # Sleeping needs the chunk index, so it is off when chunk_size is None.
+        self.idle_wake_interval = idle_wake_interval
+        self.sleeping = {}  # troop_id -> (slept_at_tick, wake_tick, watched_chunk_keys)
+        self._watchers = {}  # chunk_key -> {troop_id: sleeping troop}
+        self._wake_schedule = {}  # tick -> troops due to wake
+        
+        # Rendered window size in cells; None renders the whole field when it fits
+        self.viewport = viewport
         
-        # Initialize renderers
-        self.png_renderer = PNGRenderer(self)
-        self.svg_renderer = SVGRenderer(self)
+        # Renderers are created (and their modules imported) on first use
+        self._renderers = {}
+
+    def renderer(self, name):
+        """Return this battlefield's renderer for a registered backend, creating it on first use"""
+        if name not in self._renderers:
+            self._renderers[name] = create_renderer(name, self)
+        return self._renderers[name]
+
+    @property
+    def png_renderer(self):
+        return self.renderer('png')
+
+    @property
+    def svg_renderer(self):
+        return self.renderer('svg')
 
     def add_troop(self, troop):
+        # Ids are dense and never reused, so they can index per-troop arrays
+        troop.id = len(self.troop_registry)
+        self.troop_registry.append(troop)
         self.troops.append(troop)
+        if self.chunk_size and not self._chunks_dirty:
+            self._insert_into_chunk(troop)
+        elif self.auto_chunk and not self.chunk_size and len(self.troops) >= CHUNK_MIN_TROOPS:
+            self.chunk_size = CHUNK_SIZE
+            self._chunks_dirty = True
 
     def remove_troop(self, troop):
+        if troop.id in self.sleeping:
+            self._wake(troop)
         self.troops.remove(troop)
+        if self.chunk_size and not self._chunks_dirty:
+            self._remove_from_chunk(troop, troop.position)
+
+    def _chunk_key(self, position):
+        return (int(position[0] // self.chunk_size), int(position[1] // self.chunk_size))
+
+    def _insert_into_chunk(self, troop):
+        key = self._chunk_key(troop.position)
+        team_chunks = self.chunks.setdefault(troop.team, {})
+        team_chunks.setdefault(key, {})[troop.id] = troop
+        
+        # An enemy entering a watched chunk wakes the sleepers watching it
+        watchers = self._watchers.get(key)
+        if watchers:
+            for sleeper in [sleeper for sleeper in watchers.values() if sleeper.team != troop.team]:
+                self._wake(sleeper)
+
+    def _remove_from_chunk(self, troop, position):
+        team_chunks = self.chunks[troop.team]
+        key = self._chunk_key(position)
+        chunk = team_chunks[key]
+        del chunk[troop.id]
+        if not chunk:
+            del team_chunks[key]
+
+    def rebuild_chunks(self):
+        """
+        Re-index every troop into its spatial chunk.
+        
+        update() keeps the index current on its own; call this (or set
+        _chunks_dirty) after moving troops from outside the simulation.
+        """
+        self.chunks = {}
+        if self.chunk_size:
+            for troop in self.troops:
+                self._insert_into_chunk(troop)
+        self._chunks_dirty = False
+
+    def _move_in_chunks(self, troop, old_position):
+        """Keep the chunk index current after a troop has moved"""
+        if not self.chunk_size or self._chunks_dirty:
+            return
+        if self._chunk_key(old_position) != self._chunk_key(troop.position):
+            self._remove_from_chunk(troop, old_position)
+            self._insert_into_chunk(troop)
 
-    def get_closest_enemy(self, troop):
+    def _vision_chunks(self, troop):
+        """Chunk keys covering every cell within the troop's vision range"""
+        center_x, center_y = self._chunk_key(troop.position)
+        radius = int(troop.vision_range // self.chunk_size) + 1
+        return [(chunk_x, chunk_y)
+                for chunk_x in range(center_x - radius, center_x + radius + 1)
+                for chunk_y in range(center_y - radius, center_y + radius + 1)]
+
+    def _try_sleep(self, troop):
+        """Put an idle troop to sleep if no enemy occupies a chunk it can see into"""
+        watched = self._vision_chunks(troop)
+        for team, chunks in self.chunks.items():
+            if team != troop.team and any(key in chunks for key in watched):
+                return False
+        
+        wake_tick = self.tick + self.idle_wake_interval
+        self.sleeping[troop.id] = (self.tick, wake_tick, watched)
+        self._wake_schedule.setdefault(wake_tick, []).append(troop)
+        for key in watched:
+            self._watchers.setdefault(key, {})[troop.id] = troop
+        return True
+
+    def _wake(self, troop):
+        slept_at, _, watched = self.sleeping.pop(troop.id)
+        for key in watched:
+            watchers = self._watchers[key]
+            del watchers[troop.id]
+            if not watchers:
+                del self._watchers[key]
+        # Catch up on the cooldown ticks skipped while asleep
+        troop.cooldown_timer = max(0, troop.cooldown_timer - (self.tick - slept_at - 1))
+
+    def _wake_due_troops(self):
+        for troop in self._wake_schedule.pop(self.tick, ()):
+            sleep = self.sleeping.get(troop.id)
+            if sleep and sleep[1] == self.tick:
+                self._wake(troop)
+
+    def get_closest_enemy(self, troop, max_distance=None):
+        """
+        Find the closest enemy of a troop.
+        
+        Ties go to the troop added first. Enemies on the same cell are ignored.
+        
+        Args:
+            troop: Troop to search around
+            max_distance: Ignore enemies further than this (None for no limit)
+        
+        Returns:
+            (closest_enemy, distance), or (None, inf) if there is none
+        """
+        if self.chunk_size:
+            if self._chunks_dirty:
+                self.rebuild_chunks()
+            closest_enemy, min_dist = self._closest_enemy_in_chunks(troop, max_distance)
+        else:
+            closest_enemy = None
+            min_dist = float('inf')
+            for warrior in self.troops:
+                if warrior.team != troop.team:
+                    dist = ((warrior.position[0] - troop.position[0]) ** 2 + (warrior.position[1] - troop.position[1]) ** 2) ** 0.5
+                    if dist > 0 and (dist < min_dist or (dist == min_dist and warrior.id < closest_enemy.id)):
+                        min_dist = dist
+                        closest_enemy = warrior
+
+        if max_distance is not None and min_dist > max_distance:
+            return None, float('inf')
+        return closest_enemy , min_dist
+
+    def _closest_enemy_in_chunks(self, troop, max_distance):
+        """Search enemy chunks in growing rings around the troop's chunk"""
+        x, y = troop.position
+        center_x, center_y = self._chunk_key(troop.position)
+        enemy_chunks = [chunks for team, chunks in self.chunks.items() if team != troop.team]
+        remaining = sum(len(chunks) for chunks in enemy_chunks)
+        
         closest_enemy = None
         min_dist = float('inf')
-        for warrior in self.troops:
-            if warrior.team != troop.team:
-                dist = ((warrior.position[0] - troop.position[0]) ** 2 + (warrior.position[1] - troop.position[1]) ** 2) ** 0.5
-                if dist < min_dist and dist > 0:
+        
+        def scan(chunk):
+            nonlocal closest_enemy, min_dist
+            for warrior in chunk.values():
+                dist = ((warrior.position[0] - x) ** 2 + (warrior.position[1] - y) ** 2) ** 0.5
+                if dist > 0 and (dist < min_dist or (dist == min_dist and warrior.id < closest_enemy.id)):
                     min_dist = dist
                     closest_enemy = warrior
-
-        return closest_enemy , min_dist
+        
+        radius = 0
+        while remaining > 0:
+            # Chunks in this ring or beyond can't be closer than this
+            lower_bound = (radius - 1) * self.chunk_size
+            if lower_bound > min_dist or (max_distance is not None and lower_bound > max_distance):
+                break
+            
+            if 8 * radius >= remaining:
+                # Ring is larger than the occupied chunks left, so visit those directly
+                for chunks in enemy_chunks:
+                    for (chunk_x, chunk_y), chunk in chunks.items():
+                        if max(abs(chunk_x - center_x), abs(chunk_y - center_y)) >= radius:
+                            scan(chunk)
+                break
+            
+            for chunk_x in range(center_x - radius, center_x + radius + 1):
+                # Only the edge of the square ring is new at this radius
+                if chunk_x in (center_x - radius, center_x + radius):
+                    chunk_ys = range(center_y - radius, center_y + radius + 1)
+                else:
+                    chunk_ys = (center_y - radius, center_y + radius) if radius else (center_y,)
+                for chunk_y in chunk_ys:
+                    for chunks in enemy_chunks:
+                        chunk = chunks.get((chunk_x, chunk_y))
+                        if chunk:
+                            remaining -= 1
+                            scan(chunk)
+            radius += 1
+        
+        return closest_enemy, min_dist
     
     def nuke_dead(self):
         for troop in self.troops:
@@ -68,20 +321,60 @@ class BattleField():
                 self.remove_troop(troop)
 
     def update(self):
+        if self.update_mode == 'simultaneous':
+            return self._update_simultaneous()
+        
+        self.tick += 1
         self.nuke_dead()
+        if self._chunks_dirty:
+            self.rebuild_chunks()
+        self._wake_due_troops()
+        
+        # Each team's flow field is built the first time one of its movers needs it this tick
+        flow_fields = {} if self.movement == 'flow_field' else None
         
         # Track occupied positions to prevent overlaps
         occupied_positions = set()
         
         for troop in self.troops:
+            if troop.id in self.sleeping:
+                # Sleeping troops stay put but still block their cell
+                occupied_positions.add(troop.position)
+                continue
+            
             # Store original position for collision resolution
             original_position = troop.position
             
-            closest_enemy, distance = self.get_closest_enemy(troop)
+            flow_move = None
+            if flow_fields is not None:
+                closest_enemy = None
+                if 0 <= troop.position[0] < self.width and 0 <= troop.position[1] < self.height:
+                    # No search at all: the field says which enemy is nearest, and the troop
+                    # attacks it if it is in range or else moves down the field
+                    if troop.team not in flow_fields:
+                        flow_fields[troop.team] = self._compute_flow_field(troop.team)
+                    field = flow_fields[troop.team]
+                    closest_enemy = self._flow_enemy(troop, field)
+                    distance = float('inf')
+                    if closest_enemy:
+                        distance = ((closest_enemy.position[0] - troop.position[0]) ** 2 +
+                                    (closest_enemy.position[1] - troop.position[1]) ** 2) ** 0.5
+                    if distance > troop.attack_range:
+                        closest_enemy, flow_move = self._follow_flow(troop, field)
+                if not closest_enemy:
+                    # Off the grid, or nothing in the field's window leads to an enemy
+                    closest_enemy, distance = self.get_closest_enemy(troop, troop.vision_range)
+            else:
+                closest_enemy, distance = self.get_closest_enemy(troop, troop.vision_range)
             if not closest_enemy:
                 troop.target = None
                 troop.action = "idle"
-                troop.moveRandomly()
+                if not (self.idle_wake_interval and self.chunk_size and self._try_sleep(troop)):
+                    troop.moveRandomly(self.rng)
+            elif flow_move is not None:
+                troop.target = closest_enemy
+                troop.action = "moving"
+                troop.position = flow_move
             else:
                 if distance <= troop.attack_range:
                     if troop.cooldown_timer == 0:
@@ -90,6 +383,8 @@ class BattleField():
                         troop.action = "attacking"
                         troop.cooldown_timer = troop.cooldown+1
                         closest_enemy.health -= troop.attack
+                        for observer in self.tick_observers:
+                            observer.hit(closest_enemy, troop.attack)
                     else:
                         troop.target = closest_enemy
                         troop.action = "waiting"
@@ -106,25 +401,183 @@ class BattleField():
                 else:
                     troop.target = None
                     troop.action = "idle"
-                    troop.moveRandomly()
+                    troop.moveRandomly(self.rng)
             
             # Check for position collision and resolve it
             if troop.position in occupied_positions:
-                # Choose random axis to adjust (0 = x-axis, 1 = y-axis)
-                axis = random.choice([0, 1])
-                
-                if axis == 0:  # Adjust X towards original position
-                    adjustment = 1 if original_position[0] > troop.position[0] else -1
-                    troop.position = (troop.position[0] + adjustment, troop.position[1])
-                else:  # Adjust Y towards original position
-                    adjustment = 1 if original_position[1] > troop.position[1] else -1
-                    troop.position = (troop.position[0], troop.position[1] + adjustment)
+                self._nudge(troop, original_position)
             
             # Add current position to occupied set
             occupied_positions.add(troop.position)
+            self._move_in_chunks(troop, original_position)
 
             if troop.cooldown_timer > 0:
                 troop.cooldown_timer -= 1
+        
+        for observer in self.tick_observers:
+            observer.end_tick(self)
+    
+    def _nudge(self, troop, original_position):
+        """Step a troop that landed on an occupied cell one cell back towards where it came from"""
+        # Choose random axis to adjust (0 = x-axis, 1 = y-axis)
+        axis = self.rng.choice([0, 1])
+        
+        if axis == 0:  # Adjust X towards original position
+            adjustment = 1 if original_position[0] > troop.position[0] else -1
+            troop.position = (troop.position[0] + adjustment, troop.position[1])
+        else:  # Adjust Y towards original position
+            adjustment = 1 if original_position[1] > troop.position[1] else -1
+            troop.position = (troop.position[0], troop.position[1] + adjustment)
+    
+    def _compute_flow_field(self, team):
+        """
+        Flow field for one team: a multi-source BFS from every enemy in a window
+        FLOW_WINDOW_MARGIN cells around the team's troops, through cells no troop
+        occupies, out to the team's longest vision range. The team's own troops are
+        reached (so their cell tells them which enemy is nearest) but not passed
+        through. The BFS advances a whole layer at a time with numpy and stops
+        FLOW_MARGIN_LAYERS layers after the last of the team's troops is reached.
+        
+        Returns:
+            (distance, label, x0, y0, width, height): flat lists over the window at
+            (x0, y0), indexed by (y - y0) * width + (x - x0), of 8-connected steps to
+            the nearest enemy (-1 if unreached) and that enemy's id
+        """
+        import numpy as np
+        own = [troop.position for troop in self.troops if troop.team == team
+               and 0 <= troop.position[0] < self.width and 0 <= troop.position[1] < self.height]
+        if not own:
+            return [], [], 0, 0, 0, 0
+        depth = max(troop.vision_range for troop in self.troops if troop.team == team)
+        x0 = max(min(x for x, _ in own) - FLOW_WINDOW_MARGIN, 0)
+        y0 = max(min(y for _, y in own) - FLOW_WINDOW_MARGIN, 0)
+        x1 = min(max(x for x, _ in own) + FLOW_WINDOW_MARGIN + 1, self.width)
+        y1 = min(max(y for _, y in own) + FLOW_WINDOW_MARGIN + 1, self.height)
+        width, height = x1 - x0, y1 - y0
+        
+        distance = np.full((height, width), -1, dtype=np.int32)
+        label = np.full((height, width), -1, dtype=np.int32)
+        free = np.ones((height, width), dtype=bool)
+        own_cells = np.zeros((height, width), dtype=bool)
+        for troop in self.troops:
+            x, y = troop.position[0] - x0, troop.position[1] - y0
+            if 0 <= x < width and 0 <= y < height:
+                free[y, x] = False
+                if troop.team == team:
+                    own_cells[y, x] = True
+                elif distance[y, x] < 0:
+                    distance[y, x] = 0
+                    label[y, x] = troop.id
+        reachable = free | own_cells
+        frontier = distance == 0
+        pending = int(own_cells.sum())
+        
+        step = 0
+        remaining = None  # Layers left to fill once every troop of the team is reached
+        while step < depth and remaining != 0:
+            rows = np.flatnonzero(frontier.any(axis=1))
+            if not len(rows):
+                break
+            step += 1
+            cols = np.flatnonzero(frontier.any(axis=0))
+            # Only the frontier's bounding box, one cell wider, can be reached this layer
+            top, bottom = max(rows[0] - 1, 0), min(rows[-1] + 2, height)
+            left, right = max(cols[0] - 1, 0), min(cols[-1] + 2, width)
+            source = np.full((bottom - top + 2, right - left + 2), -1, dtype=np.int32)
+            source[1:-1, 1:-1] = np.where(frontier[top:bottom, left:right], label[top:bottom, left:right], -1)
+            box_height, box_width = bottom - top, right - left
+            reached = np.full((box_height, box_width), -1, dtype=np.int32)
+            for dx, dy in FLOW_NEIGHBOURS:
+                # reached[y, x] takes source[y - dy, x - dx]; earlier directions win ties
+                np.copyto(reached, source[1 - dy:1 - dy + box_height, 1 - dx:1 - dx + box_width],
+                          where=reached < 0)
+            box = (slice(top, bottom), slice(left, right))
+            new = (reached >= 0) & (distance[box] < 0) & reachable[box]
+            distance[box][new] = step
+            label[box][new] = reached[new]
+            # The team's own cells are reached but not passed through
+            frontier = np.zeros((height, width), dtype=bool)
+            frontier[box] = new & free[box]
+            pending -= int((new & own_cells[box]).sum())
+            if remaining is not None:
+                remaining -= 1
+            elif not pending:
+                remaining = FLOW_MARGIN_LAYERS
+        return distance.ravel().tolist(), label.ravel().tolist(), x0, y0, width, height
+    
+    def _flow_enemy(self, troop, field):
+        """Enemy whose BFS wave reached the troop's own cell first, or None"""
+        _, label, x0, y0, width, height = field
+        x, y = troop.position[0] - x0, troop.position[1] - y0
+        if 0 <= x < width and 0 <= y < height and label[y * width + x] >= 0:
+            return self.troop_registry[label[y * width + x]]
+        return None
+    
+    def _follow_flow(self, troop, field):
+        """
+        Walk up to troop.speed steps downhill on a flow field.
+        
+        Returns:
+            (enemy the field leads to, new position), or (None, None) when no free
+            neighbouring cell leads to an enemy within the troop's vision range
+        """
+        distance, label, x0, y0, width, height = field
+        x, y = troop.position[0] - x0, troop.position[1] - y0
+        first = None
+        for _ in range(troop.speed):
+            best = None
+            for dx, dy in FLOW_NEIGHBOURS:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < width and 0 <= ny < height:
+                    cell = ny * width + nx
+                    # Enemy cells (0) are never stepped onto
+                    if distance[cell] > 0 and (best is None or distance[cell] < distance[best]):
+                        best = cell
+            if best is None or (first is not None and distance[best] >= distance[y * width + x]):
+                break
+            if first is None:
+                if distance[best] + 1 > troop.vision_range:
+                    break
+                first = best
+            x, y = best % width, best // width
+        
+        if first is None:
+            return None, None
+        return self.troop_registry[label[first]], (x + x0, y + y0)
+    
+    def _update_simultaneous(self):
+        """
+        One tick in which every troop acts on the previous tick's state.
+        
+        Dead troops are all removed first. Decisions only read the battlefield,
+        so they could be computed in any order or in parallel; damage and moves
+        are then committed together, with cell conflicts settled by troop id.
+        """
+        from simultaneous import decide, resolve_moves, accumulate_damage
+        
+        self.tick += 1
+        for troop in [troop for troop in self.troops if troop.health <= 0]:
+            self.remove_troop(troop)
+        if self._chunks_dirty:
+            self.rebuild_chunks()
+        
+        decisions = [decide(troop, *self.get_closest_enemy(troop, troop.vision_range), self.counter_key, self.tick)
+                     for troop in self.troops]
+        final_positions = resolve_moves(decisions, self.counter_key, self.tick)
+        
+        for troop, (_, action, target_id, _, original, _, cooldown_timer) in zip(self.troops, decisions):
+            troop.action = action
+            troop.target = self.troop_registry[target_id] if target_id is not None else None
+            troop.cooldown_timer = cooldown_timer
+            troop.position = final_positions[troop.id]
+            self._move_in_chunks(troop, original)
+        for target_id, damage in accumulate_damage(decisions).items():
+            self.troop_registry[target_id].health -= damage
+            for observer in self.tick_observers:
+                observer.hit(self.troop_registry[target_id], damage)
+        
+        for observer in self.tick_observers:
+            observer.end_tick(self)
     
     def capture_frame_data(self):
         """Capture current frame data for SVG animation"""
@@ -137,11 +590,11 @@ class BattleField():
         # Capture troop data
         for troop in self.troops:
             troop_data = {
-                'id': id(troop),  # Unique ID for tracking
+                'id': troop.id,  # Stable dense ID for tracking
                 'position': troop.position,
                 'team': troop.team,
                 'health_ratio': troop.health / troop.max_health,
-                'type': 'barbarian' if troop.attack == 20 else 'archer',
+                'type': troop.unit,
                 'alive': troop.health > 0
             }
             frame_data['troops'].append(troop_data)
@@ -150,8 +603,8 @@ class BattleField():
             if hasattr(troop, 'target') and troop.target and hasattr(troop, 'action'):
                 if troop.action in ['attacking', 'moving', 'waiting']:
                     arrow_data = {
-                        'from_id': id(troop),
-                        'to_id': id(troop.target),
+                        'from_id': troop.id,
+                        'to_id': troop.target.id,
                         'from_pos': troop.position,
                         'to_pos': troop.target.position,
                         'color': 'red' if troop.action in ['attacking', 'waiting'] else 'yellow',
@@ -161,16 +614,306 @@ class BattleField():
         
         self.animation_frames.append(frame_data)
         self.frame_counter += 1
+        for listener in self.frame_listeners:
+            listener(frame_data)
+
+    def get_troop_timelines(self):
+        """
+        Return per-troop time series built from the captured frames.
+
+        Returns:
+            (troop_timelines, arrow_timelines) where troop_timelines[troop_id][i]
+            is the troop data in frame i (None if absent) and arrow_timelines
+            is laid out the same way for the troop's arrow.
+        """
+        num_frames = len(self.animation_frames)
+        cache = self._timelines_cache
+        if cache is not None and cache[0] == self.frames_recorded and cache[1] == len(self.troop_registry):
+            return cache[2], cache[3]
+
+        num_troops = len(self.troop_registry)
+        if isinstance(self.animation_frames, DeltaFrameRecording):
+            troop_timelines, arrow_timelines = self.animation_frames.timelines(num_troops)
+            self._timelines_cache = (self.frames_recorded, num_troops, troop_timelines, arrow_timelines)
+            return troop_timelines, arrow_timelines
+
+        troop_timelines = [[None] * num_frames for _ in range(num_troops)]
+        arrow_timelines = [[None] * num_frames for _ in range(num_troops)]
+        for i, frame in enumerate(self.animation_frames):
+            for troop_data in frame['troops']:
+                troop_timelines[troop_data['id']][i] = troop_data
+            for arrow_data in frame['arrows']:
+                arrow_timelines[arrow_data['from_id']][i] = arrow_data
+
+        self._timelines_cache = (self.frames_recorded, num_troops, troop_timelines, arrow_timelines)
+        return troop_timelines, arrow_timelines
+    
+    def focus_positions(self, frame=None):
+        """
+        Positions the viewport should follow: fighting troops, else everyone.
+        Read from a captured frame, or from the live troops when frame is None.
+        """
+        if frame is None:
+            fighting = [troop.position for troop in self.troops
+                        if getattr(troop, 'action', None) in ('attacking', 'waiting')]
+            return fighting or [troop.position for troop in self.troops]
+        fighting = [arrow['from_pos'] for arrow in frame['arrows'] if arrow['color'] == 'red']
+        return fighting or [troop['position'] for troop in frame['troops']]
+    
+    def get_viewport(self, scale, focus_positions):
+        """
+        Return the (x, y, width, height) window of cells to render.
+        
+        The whole field is used when it fits within MAX_IMAGE_SIZE pixels (and no
+        viewport was requested); otherwise a fixed-size window is centred on the
+        focus positions and clamped to the field.
+        """
+        if (self.viewport is None and self.width * scale <= MAX_IMAGE_SIZE
+                and self.height * scale <= MAX_IMAGE_SIZE):
+            return (0, 0, self.width, self.height)
+        
+        view_width, view_height = self.viewport or (MAX_IMAGE_SIZE // scale, MAX_IMAGE_SIZE // scale)
+        view_width = min(view_width, self.width)
+        view_height = min(view_height, self.height)
+        
+        if focus_positions:
+            xs = [position[0] for position in focus_positions]
+            ys = [position[1] for position in focus_positions]
+            center_x = (min(xs) + max(xs)) / 2
+            center_y = (min(ys) + max(ys)) / 2
+        else:
+            center_x = self.width / 2
+            center_y = self.height / 2
+        
+        x = int(min(max(center_x - view_width / 2, 0), self.width - view_width))
+        y = int(min(max(center_y - view_height / 2, 0), self.height - view_height))
+        return (x, y, view_width, view_height)
     
     def save_board_state(self, scale=20):
         """Save the current board state as a high-quality image"""
         return self.png_renderer.save_board_state(scale)
 
+    def track_stats(self, path=None, keep=True):
+        """
+        Start collecting per-tick aggregates (team health, damage, deaths, action
+        counts, target distance) during update(), headless runs included.
+        Rows are kept in memory and/or streamed to a CSV file at path.
+
+        Returns:
+            The TickStats collector, also available as self.tick_stats
+        """
+        from tick_stats import TickStats
+        if self.tick_stats is not None:
+            self.tick_observers.remove(self.tick_stats)
+        self.tick_stats = TickStats(path, keep)
+        self.tick_observers.append(self.tick_stats)
+        return self.tick_stats
+
+    def track_heatmap(self, every=1):
+        """
+        Start binning troop positions (sampled every `every` ticks) and death
+        locations per cell and team during update(). Memory does not grow with
+        the length of the battle. Needs numpy.
+
+        Returns:
+            The Heatmap, also available as self.heatmap
+        """
+        from heatmap import Heatmap
+        if self.heatmap is not None:
+            self.tick_observers.remove(self.heatmap)
+        self.heatmap = Heatmap(self.width, self.height, every)
+        self.tick_observers.append(self.heatmap)
+        return self.heatmap
+
+    @property
+    def frames_recorded(self):
+        """Frames captured so far, including any a ring recording has dropped"""
+        if isinstance(self.animation_frames, RingFrameRecording):
+            return self.animation_frames.total
+        return len(self.animation_frames)
+
+    def memory_usage(self):
+        """
+        Return the tick, frames recorded overall and held in memory, and the
+        process's resident memory in bytes (None where /proc is unavailable).
+        """
+        try:
+            with open('/proc/self/statm') as f:
+                rss_bytes = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError, AttributeError):
+            rss_bytes = None
+        return {
+            'tick': self.tick,
+            'frames_recorded': self.frames_recorded,
+            'frames_in_memory': len(self.animation_frames),
+            'rss_bytes': rss_bytes,
+        }
+
     def get_team_counts(self):
         """Return count of troops for each team"""
         team_true_count = sum(1 for troop in self.troops if troop.team)
         team_false_count = sum(1 for troop in self.troops if not troop.team)
         return team_true_count, team_false_count
+
+    def checkpoint(self):
+        """
+        Snapshot the full simulation state as plain data.
+
+        The snapshot holds every troop's stats, health, position, cooldown, target
+        and action, the RNG state, the tick and frame counters and the sleep state.
+        It can be pickled, restored with restore() or turned into an independent
+        battlefield with from_checkpoint() / fork().
+        """
+        rng_state = self.rng.getstate()
+        keep_frames = RING_FRAMES
+        spill_dir = None
+        if isinstance(self.animation_frames, RingFrameRecording):
+            recording = ('ring', self.animation_frames.keyframe_interval)
+            keep_frames = self.animation_frames.keep_frames
+            spill_dir = self.animation_frames.spill_dir
+        elif isinstance(self.animation_frames, DeltaFrameRecording):
+            recording = ('delta', self.animation_frames.keyframe_interval)
+        else:
+            recording = ('full', KEYFRAME_INTERVAL)
+        return {
+            'engine': ENGINE_VERSION,
+            'config': {
+                'width': self.width,
+                'height': self.height,
+                'chunk_size': 'auto' if self.auto_chunk else self.chunk_size,
+                'viewport': self.viewport,
+                'idle_wake_interval': self.idle_wake_interval,
+                'seed': self.seed,
+                'recording': recording[0],
+                'keyframe_interval': recording[1],
+                'update_mode': self.update_mode,
+                'keep_frames': keep_frames,
+                'spill_dir': spill_dir,
+                'movement': self.movement,
+            },
+            # (stats, team, health, position, cooldown_timer, target_id, action, unit), indexed by id
+            'troops': [
+                ((troop.max_health, troop.attack, troop.speed, troop.attack_range, troop.vision_range,
+                  troop.cooldown), troop.team, troop.health, troop.position, troop.cooldown_timer,
+                 troop.target.id if getattr(troop, 'target', None) else None, getattr(troop, 'action', None),
+                 troop.unit)
+                for troop in self.troop_registry
+            ],
+            'active': [troop.id for troop in self.troops],
+            'rng_state': rng_state,
+            'counter_key': self.counter_key,
+            'tick': self.tick,
+            'frame_counter': self.frame_counter,
+            'frames': self.frames_recorded,
+            'sleeping': dict(self.sleeping),
+            # Heatmap counts so far, so restoring doesn't count the replayed ticks twice
+            'heatmap': self.heatmap.snapshot() if self.heatmap is not None else None,
+        }
+
+    def restore(self, checkpoint):
+        """
+        Return the simulation to a checkpoint taken from this battlefield (or one
+        with the same configuration). Troop objects are replaced, and frames
+        recorded after the checkpoint are dropped.
+        """
+        if checkpoint['engine'] != ENGINE_VERSION:
+            raise ValueError(f"Checkpoint is from engine version {checkpoint['engine']}, not {ENGINE_VERSION}")
+
+        self.troop_registry = []
+        for troop_id, (stats, team, health, position, cooldown_timer, _, action, *unit) in enumerate(checkpoint['troops']):
+            troop = Troop(stats, position, team, *unit)
+            troop.id = troop_id
+            troop.health = health
+            troop.cooldown_timer = cooldown_timer
+            troop.target = None
+            if action is not None:
+                troop.action = action
+            self.troop_registry.append(troop)
+        for troop, state in zip(self.troop_registry, checkpoint['troops']):
+            if state[5] is not None:
+                troop.target = self.troop_registry[state[5]]
+        self.troops = [self.troop_registry[troop_id] for troop_id in checkpoint['active']]
+
+        self.rng.setstate(checkpoint['rng_state'])
+        self.counter_key = checkpoint['counter_key']
+        self.tick = checkpoint['tick']
+        self.frame_counter = checkpoint['frame_counter']
+        if isinstance(self.animation_frames, RingFrameRecording):
+            self.animation_frames.rewind(checkpoint['frames'])
+        else:
+            del self.animation_frames[checkpoint['frames']:]
+        self._timelines_cache = None
+        self.outcome = None
+        if self.tick_stats is not None:
+            self.tick_stats.rewind(self.tick)
+        if self.heatmap is not None:
+            if checkpoint.get('heatmap') is None:
+                raise ValueError("Checkpoint was taken without a heatmap; detach the heatmap before restoring")
+            self.heatmap.restore(checkpoint['heatmap'])
+
+        # Index the restored troops before the sleepers start watching chunks
+        self.sleeping = {}
+        self._watchers = {}
+        self._wake_schedule = {}
+        self._chunks_dirty = True
+        if self.auto_chunk and not self.chunk_size and len(self.troops) >= CHUNK_MIN_TROOPS:
+            self.chunk_size = CHUNK_SIZE
+        if self.chunk_size:
+            self.rebuild_chunks()
+        for troop_id, (slept_at, wake_tick, watched) in checkpoint['sleeping'].items():
+            troop = self.troop_registry[troop_id]
+            self.sleeping[troop_id] = (slept_at, wake_tick, watched)
+            self._wake_schedule.setdefault(wake_tick, []).append(troop)
+            for key in watched:
+                self._watchers.setdefault(key, {})[troop_id] = troop
+
+    @classmethod
+    def from_checkpoint(cls, checkpoint):
+        """Create an independent battlefield in the state of a checkpoint"""
+        config = checkpoint['config']
+        if config.get('spill_dir'):
+            # Spill into a folder of its own, so the parent's keyframes are never overwritten or deleted
+            os.makedirs(config['spill_dir'], exist_ok=True)
+            config = dict(config, spill_dir=tempfile.mkdtemp(prefix='fork_', dir=config['spill_dir']))
+        battlefield = cls(**config)
+        # Unseeded battles use the global RNG; a copy keeps the branch from sharing it
+        battlefield.rng = random.Random()
+        battlefield.restore(checkpoint)
+        return battlefield
+
+    def fork(self, checkpoint=None):
+        """Branch off an independent battlefield from a checkpoint (default: right now)"""
+        return BattleField.from_checkpoint(checkpoint if checkpoint is not None else self.checkpoint())
+
+    def predict_winner(self):
+        """
+        Estimate the winner from the strength each team has left.
+        
+        Strength follows Lanchester's square law: remaining health times damage
+        per tick. A team that can no longer deal damage loses with certainty;
+        otherwise confidence is strength_ratio / (1 + strength_ratio).
+        
+        Returns:
+            (team, confidence) for the favoured team, or (None, 0.0) if even
+        """
+        health = {}
+        damage = {}
+        for troop in self.troops:
+            if troop.health > 0:
+                health[troop.team] = health.get(troop.team, 0) + troop.health
+                damage[troop.team] = damage.get(troop.team, 0) + troop.attack / (troop.cooldown + 1)
+        
+        if len(health) < 2:
+            return (next(iter(health)), 1.0) if health else (None, 0.0)
+        
+        strength = {team: health[team] * damage[team] for team in health}
+        favourite, underdog = sorted(strength, key=strength.get, reverse=True)[:2]
+        if strength[favourite] == strength[underdog]:
+            return None, 0.0
+        if damage[underdog] == 0:
+            return favourite, 1.0
+        ratio = strength[favourite] / strength[underdog]
+        return favourite, ratio / (1 + ratio)
     
     def save_video(self, fps=2):
         """Save all frames as a video with each frame showing for 0.5 seconds (fps=2)"""
@@ -179,37 +922,69 @@ class BattleField():
             return
             
         video_path = os.path.join(self.png_renderer.output_folder, "battle_simulation.mp4")
-        frames_folder = self.png_renderer.frames_folder
+        sink = self.png_renderer.sink
+        if sink.streams_video:
+            # Frames went straight into the video as they were drawn (at the sink's fps)
+            sink.finish(self.frame_counter - 1)
+            print(f"Video saved to {video_path}")
+            return
         
+        import imageio  # Only needed when a video is actually written
         with imageio.get_writer(video_path, fps=fps) as writer:
-            for i in range(1, self.frame_counter):  # Start from 1 since frame_counter starts at 1
-                frame_path = os.path.join(frames_folder, f"frame_{i:04d}.png")
-                if os.path.exists(frame_path):
-                    # First and last frames stay longer, others stay for 0.5 seconds
-                    frame_count = 5 if i == 1 or i == self.frame_counter - 1 else 1
-                    for _ in range(frame_count):
-                        writer.append_data(imageio.imread(frame_path))
+            for i, frame in sink.frames(self.frame_counter):  # Start from 1 since frame_counter starts at 1
+                # First and last frames stay longer, others stay for 0.5 seconds
+                frame_count = 5 if i == 1 or i == self.frame_counter - 1 else 1
+                for _ in range(frame_count):
+                    writer.append_data(frame)
+        sink.close()
         
         print(f"Video saved to {video_path}")
     
     def create_animated_svg(self, scale=20, frame_duration=0.5):
         """Create an animated SVG from all captured frame data"""
         return self.svg_renderer.create_animated_svg(scale, frame_duration)
+
+    def create_canvas_player(self, scale=20, frame_duration=0.5):
+        """Create a self-contained HTML canvas replay from all captured frame data"""
+        return self.renderer('canvas').create_player(scale, frame_duration)
     
     
-    def run(self, max_iterations=None, stagnation_threshold=STAGNATION_THRESHOLD):
+    def run(self, max_iterations=None, stagnation_threshold=STAGNATION_THRESHOLD, predict_confidence=None,
+            render=True, animations=('svg', 'canvas'), memory_log=None, frame_sink='png'):
         """
         Run the simulation for a specified number of iterations or until stagnation.
         
         Args:
             max_iterations: Maximum number of iterations to run (None for unlimited)
             stagnation_threshold: Stop if troop counts don't change for this many iterations (default 100)
+            predict_confidence: Stop early once predict_winner() reaches this confidence
+                                (None to always play the battle out, 1.0 for certain outcomes only)
+            render: Capture frames and write PNG, animation and video output (False for headless runs)
+            animations: Animated exports to write when rendering: 'svg' (SMIL) and/or
+                        'canvas' (compact HTML player, much smaller for large battles)
+            memory_log: Optional CSV path that gets a memory_usage() row after every tick
+            frame_sink: Where rendered frames go: 'png', 'png_fast' (low zlib level),
+                        'npy' (one raw RGB stack) or 'video' (piped straight into the MP4)
         
         Returns:
-            Number of iterations completed
+            Number of iterations completed. self.outcome records the reason the run
+            ended, the winner, and whether that winner was predicted.
         """
         iteration = 0
-        troop_count_history = []
+        # Only the last stagnation_threshold counts matter, so open-ended runs stay bounded
+        troop_count_history = deque(maxlen=stagnation_threshold)
+        self.outcome = {'reason': 'max_iterations', 'winner': None, 'predicted': False, 'confidence': 0.0}
+        memory_file = None
+        if memory_log:
+            memory_file = open(memory_log, 'w')
+            memory_file.write("tick,frames_recorded,frames_in_memory,rss_bytes\n")
+        if render:
+            renderer = self.png_renderer
+            # The sink is created with the output folder, so it can't change between runs
+            if renderer.sink is not None and frame_sink != renderer.frame_sink:
+                raise ValueError(f"This battle's frames already go to the {renderer.frame_sink!r} sink, "
+                                 f"not {frame_sink!r}")
+            renderer.frame_sink = frame_sink
         
         while True:
             # Check if we've reached max iterations
@@ -217,9 +992,14 @@ class BattleField():
                 break
             
             # Capture frame data and save state first, then update simulation
-            self.capture_frame_data()
-            self.save_board_state()
+            if render:
+                self.capture_frame_data()
+                self.save_board_state()
             self.update()
+            if memory_file:
+                usage = self.memory_usage()
+                memory_file.write(f"{usage['tick']},{usage['frames_recorded']},{usage['frames_in_memory']},"
+                                  f"{'' if usage['rss_bytes'] is None else usage['rss_bytes']}\n")
             
             # Track troop counts for stagnation detection
             team_counts = self.get_team_counts()
@@ -227,22 +1007,43 @@ class BattleField():
             
             # Check for stagnation (no change in troop counts for threshold iterations)
             if len(troop_count_history) >= stagnation_threshold:
-                recent_counts = troop_count_history[-stagnation_threshold:]
-                if all(counts == recent_counts[0] for counts in recent_counts):
+                if all(counts == troop_count_history[0] for counts in troop_count_history):
                     print(f"Simulation stopped due to stagnation after {iteration + 1} iterations")
+                    self.outcome['reason'] = 'stagnation'
                     break
             
             # Check if one side has won (no troops left for one team)
             if team_counts[0] == 0 or team_counts[1] == 0:
                 winner = "Team Blue" if team_counts[0] > 0 else "Team Red"
                 print(f"Simulation ended: {winner} wins after {iteration + 1} iterations!")
+                self.outcome.update(reason='elimination', winner=team_counts[0] > 0, confidence=1.0)
                 break
             
+            # Check whether the result is already decided
+            if predict_confidence is not None:
+                winner, confidence = self.predict_winner()
+                if winner is not None and confidence >= predict_confidence:
+                    label = "Team Blue" if winner else "Team Red"
+                    print(f"Simulation stopped: {label} predicted to win after {iteration + 1} iterations "
+                          f"(confidence {confidence:.3f})")
+                    self.outcome.update(reason='predicted', winner=winner, predicted=True, confidence=confidence)
+                    break
+            
             iteration += 1
         
+        if memory_file:
+            memory_file.close()
+        self.outcome['iterations'] = iteration + 1
+        if not render:
+            return iteration + 1
+        
         # Create animated SVG after simulation ends
-        print("Creating animated SVG from simulation data...")
-        self.create_animated_svg()
+        if 'svg' in animations:
+            print("Creating animated SVG from simulation data...")
+            self.create_animated_svg()
+        if 'canvas' in animations:
+            print("Creating canvas player from simulation data...")
+            self.create_canvas_player()
         
         # Create video after simulation ends
         print("Creating video from simulation frames...")
@@ -0,0 +1,135 @@
+import io
+import os
+import sys
+import time
+import argparse
+import tempfile
+import contextlib
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Modules a simulation-only process should never have to load
+RENDER_MODULES = ('PIL', 'imageio', 'xml.etree.ElementTree', 'svg_renderer', 'png_renderer')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def measure_import():
+    """Time `import battlefield` in a fresh interpreter and list any rendering modules it loaded"""
+    code = (
+        "import sys, time\n"
+        "start = time.perf_counter()\n"
+        "import battlefield\n"
+        "elapsed = time.perf_counter() - start\n"
+        f"loaded = [name for name in {RENDER_MODULES!r} if name in sys.modules]\n"
+        "print(elapsed, ','.join(loaded))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=HERE, capture_output=True, text=True,
+                            check=True).stdout.split()
+    return float(output[0]), output[1].split(',') if len(output) > 1 else []
+
+
+def _worker_task(_):
+    # What a sweep worker does before its first battle
+    from battlefield import BattleField
+    BattleField(100, 100, seed=0)
+    return os.getpid()
+
+
+def measure_worker_startup(workers):
+    """Time from creating a pool of fresh (spawned) workers until each has built a battlefield"""
+    start = time.perf_counter()
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        list(executor.map(_worker_task, range(workers)))
+    return time.perf_counter() - start
+
+
+def measure_simulation(ticks, seed=0):
+    """Headless ticks per second of the default formation battle"""
+    from sweep import build_battlefield, resolve_params
+    battlefield = build_battlefield(resolve_params({}), seed)
+    start = time.perf_counter()
+    for _ in range(ticks):
+        battlefield.update()
+    return ticks / (time.perf_counter() - start)
+
+
+def measure_batched(battles, max_iterations=300):
+    """Formation battles per second, one at a time and advanced together with BatchedBattles"""
+    from sweep import build_battlefield, resolve_params
+    from batch_engine import BatchedBattles
+
+    params = resolve_params({})
+    battlefields = [build_battlefield(params, seed) for seed in range(battles)]
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for battlefield in battlefields:
+            battlefield.run(max_iterations=max_iterations, render=False)
+    sequential = battles / (time.perf_counter() - start)
+
+    battlefields = [build_battlefield(params, seed) for seed in range(battles)]
+    start = time.perf_counter()
+    BatchedBattles(battlefields).run(max_iterations=max_iterations)
+    return sequential, battles / (time.perf_counter() - start)
+
+
+def measure_frame_sinks(frames, seed=0):
+    """
+    Rendered frames per second for each frame sink, counting drawing, writing
+    and turning the frames into the video (simulation time excluded)
+    """
+    from sweep import build_battlefield, resolve_params
+    from frame_sinks import FRAME_SINKS
+
+    results = {}
+    cwd = os.getcwd()
+    for name in FRAME_SINKS:
+        battlefield = build_battlefield(resolve_params({}), seed)
+        battlefield.png_renderer.frame_sink = name
+        elapsed = 0.0
+        with tempfile.TemporaryDirectory() as folder, contextlib.redirect_stdout(io.StringIO()):
+            os.chdir(folder)
+            try:
+                for _ in range(frames):
+                    battlefield.capture_frame_data()
+                    start = time.perf_counter()
+                    battlefield.save_board_state()
+                    elapsed += time.perf_counter() - start
+                    battlefield.update()
+                start = time.perf_counter()
+                battlefield.save_video()
+                elapsed += time.perf_counter() - start
+            finally:
+                os.chdir(cwd)
+        results[name] = frames / elapsed
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure simulation startup and throughput")
+    parser.add_argument('--workers', type=int, default=4, help="Worker processes for the startup test")
+    parser.add_argument('--ticks', type=int, default=300, help="Ticks for the throughput test")
+    parser.add_argument('--battles', type=int, default=200, help="Battles for the batched engine test")
+    parser.add_argument('--frames', type=int, default=60, help="Frames for the frame sink test")
+    args = parser.parse_args()
+
+    import_time, loaded = measure_import()
+    print(f"import battlefield: {import_time * 1000:.1f} ms"
+          f" (rendering modules loaded: {', '.join(loaded) if loaded else 'none'})")
+    print(f"worker startup: {measure_worker_startup(args.workers) * 1000:.1f} ms for {args.workers} spawned workers")
+    print(f"simulation: {measure_simulation(args.ticks):.0f} ticks/s")
+    try:
+        sequential, batched = measure_batched(args.battles)
+        print(f"battles: {sequential:.1f}/s one at a time, {batched:.1f}/s batched ({args.battles} battles)")
+    except ImportError:
+        print("battles: batched engine skipped (needs numpy)")
+    try:
+        rates = measure_frame_sinks(args.frames)
+        print("frame sinks: " + ", ".join(f"{name} {rate:.1f} frames/s" for name, rate in rates.items()))
+    except ImportError:
+        print("frame sinks: skipped (needs PIL, numpy and imageio)")
+
+if __name__ == "__main__":
+    main()
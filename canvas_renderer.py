@@ -0,0 +1,233 @@
+import os
+import json
+from live_server import frame_rows
+
+
+class CanvasRenderer:
+    """
+    Exports a battle as a single self-contained HTML page that replays it on a
+    canvas.
+
+    Frames are stored as changes only (rows like the ones the live preview
+    streams) in one compact JSON payload embedded in the page. The player rebuilds each
+    frame from the previous one, interpolates positions between frames and
+    draws with requestAnimationFrame. File size grows with what happens in the
+    battle rather than with troops x frames x animated attributes, as it does in
+    the SMIL SVG.
+    """
+
+    def __init__(self, battlefield):
+        self.battlefield = battlefield
+
+    def build_payload(self, scale=20, frame_duration=0.5):
+        """
+        Encode the recorded frames compactly.
+
+        'troops' holds each troop's fixed [team, is_archer] by id. Each entry of
+        'deltas' is [changed rows, removed ids] for one frame, with the rows
+        flattened as [id, x, y, health per mille, target_id, arrow, ...].
+        """
+        troops = []
+        deltas = []
+        views = []
+        previous_rows = {}
+        last_view = None
+        for index, frame in enumerate(self.battlefield.animation_frames):
+            rows = {}
+            for troop_id, x, y, health, team, is_archer, target_id, arrow in frame_rows(frame):
+                rows[troop_id] = (troop_id, x, y, round(health * 1000), target_id, arrow)
+                if troop_id >= len(troops):
+                    troops.extend([None] * (troop_id + 1 - len(troops)))
+                troops[troop_id] = [team, is_archer]
+            changed = [value for troop_id, row in rows.items() if previous_rows.get(troop_id) != row for value in row]
+            removed = [troop_id for troop_id in previous_rows if troop_id not in rows]
+            deltas.append([changed, removed])
+            previous_rows = rows
+
+            # Same viewport the PNG and SVG renderers follow
+            view = self.battlefield.get_viewport(scale, self.battlefield.focus_positions(frame))
+            if view != last_view:
+                views.append([index, *view])
+                last_view = view
+
+        return {
+            'width': self.battlefield.width,
+            'height': self.battlefield.height,
+            'scale': scale,
+            'frameDuration': frame_duration,
+            'rowSize': 6,
+            'troops': troops,
+            'views': views,
+            'deltas': deltas,
+        }
+
+    def create_player(self, scale=20, frame_duration=0.5):
+        """Write battle_player.html next to the other output"""
+        if not self.battlefield.animation_frames:
+            print("No animation frames captured.")
+            return None
+
+        if not self.battlefield.png_renderer.output_folder:
+            print("No output folder found.")
+            return None
+
+        payload = json.dumps(self.build_payload(scale, frame_duration), separators=(',', ':'))
+        # Keep the payload from closing its <script> tag early
+        html = PLAYER_HTML.replace('{{PAYLOAD}}', payload.replace('</', '<\\/'))
+
+        player_path = os.path.join(self.battlefield.png_renderer.output_folder, "battle_player.html")
+        with open(player_path, 'w', encoding='utf-8') as f:
+            f.write(html)
+
+        print(f"Canvas player saved to {player_path}")
+        return player_path
+
+
+PLAYER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Battle Replay</title>
+<style>
+  body { margin: 0; background: #222; color: #ddd; font-family: sans-serif; }
+  #controls { padding: 4px 8px; display: flex; gap: 8px; align-items: center; }
+  #seek { flex: 1; }
+</style>
+</head>
+<body>
+<div id="controls">
+  <button id="play">Pause</button>
+  <select id="speed"><option>0.5</option><option selected>1</option><option>2</option><option>4</option></select>
+  <input id="seek" type="range" min="0" value="0">
+  <span id="status"></span>
+</div>
+<canvas id="board"></canvas>
+<script type="application/json" id="battle-data">{{PAYLOAD}}</script>
+<script>
+const data = JSON.parse(document.getElementById('battle-data').textContent);
+const canvas = document.getElementById('board');
+const ctx = canvas.getContext('2d');
+const seek = document.getElementById('seek');
+const status = document.getElementById('status');
+const playButton = document.getElementById('play');
+const speedSelect = document.getElementById('speed');
+const frames = data.deltas.length, scale = data.scale, stride = data.rowSize;
+const size = Math.floor(scale * 0.7), barWidth = Math.floor(scale * 0.8), barHeight = Math.floor(scale * 0.15);
+seek.max = frames - 1;
+canvas.width = data.views[0][3] * scale;
+canvas.height = data.views[0][4] * scale;
+
+// Troop rows by id: [id, x, y, health per mille, target_id, arrow]
+function applyDelta(state, index) {
+  const next = new Map(state);
+  const [changed, removed] = data.deltas[index];
+  for (const id of removed) next.delete(id);
+  for (let i = 0; i < changed.length; i += stride) next.set(changed[i], changed.slice(i, i + stride));
+  return next;
+}
+
+let index = -1, current = new Map(), upcoming = new Map();
+function goTo(target) {
+  if (target !== index + 1 || index < 0) {
+    current = new Map();
+    for (let i = 0; i <= target; i++) current = applyDelta(current, i);
+  } else {
+    current = upcoming;
+  }
+  index = target;
+  upcoming = index + 1 < frames ? applyDelta(current, index + 1) : current;
+}
+
+function viewAt(frame) {
+  let view = data.views[0];
+  for (const candidate of data.views) { if (candidate[0] > frame) break; view = candidate; }
+  return view;
+}
+
+function position(row, t) {
+  const next = upcoming.get(row[0]);
+  if (!next) return [row[1] * scale, row[2] * scale];
+  return [(row[1] + (next[1] - row[1]) * t) * scale, (row[2] + (next[2] - row[2]) * t) * scale];
+}
+
+function drawArrow(from, to, code) {
+  const dx = to[0] - from[0], dy = to[1] - from[1], length = Math.hypot(dx, dy);
+  if (length === 0) return;
+  const ux = dx / length, uy = dy / length, head = 10;
+  const tipX = to[0] - ux * head, tipY = to[1] - uy * head;
+  const color = code === 3 ? 'yellow' : 'red';
+  ctx.globalAlpha = 0.7;
+  ctx.strokeStyle = color;
+  ctx.lineWidth = 3;
+  ctx.setLineDash(code === 2 ? [5, 5] : []);
+  ctx.beginPath();
+  ctx.moveTo(from[0] + ux * size * 0.7, from[1] + uy * size * 0.7);
+  ctx.lineTo(tipX - ux * head * 0.5, tipY - uy * head * 0.5);
+  ctx.stroke();
+  ctx.setLineDash([]);
+  ctx.fillStyle = color;
+  ctx.beginPath();
+  ctx.moveTo(tipX, tipY);
+  ctx.lineTo(tipX - head * (ux * 0.866 - uy * 0.5), tipY - head * (uy * 0.866 + ux * 0.5));
+  ctx.lineTo(tipX - head * (ux * 0.866 + uy * 0.5), tipY - head * (uy * 0.866 - ux * 0.5));
+  ctx.fill();
+  ctx.globalAlpha = 1;
+}
+
+function draw(t) {
+  const view = viewAt(index);
+  ctx.setTransform(1, 0, 0, 1, -view[1] * scale, -view[2] * scale);
+  ctx.fillStyle = '#8B4513';
+  ctx.fillRect(view[1] * scale, view[2] * scale, canvas.width, canvas.height);
+
+  const positions = new Map();
+  for (const row of current.values()) positions.set(row[0], position(row, t));
+
+  for (const row of current.values()) {
+    if (row[3] <= 0) continue;
+    const [x, y] = positions.get(row[0]);
+    const [team, isArcher] = data.troops[row[0]];
+    ctx.fillStyle = team === 0 ? '#0080FF' : '#FF4040';
+    ctx.strokeStyle = 'black';
+    ctx.lineWidth = 2;
+    ctx.beginPath();
+    if (isArcher) ctx.rect(x - size / 2, y - size / 2, size, size);
+    else ctx.arc(x, y, size / 2, 0, 2 * Math.PI);
+    ctx.fill();
+    ctx.stroke();
+
+    const barX = x - barWidth / 2, barY = y - size / 2 - barHeight - 3;
+    ctx.fillStyle = 'red';
+    ctx.lineWidth = 1;
+    ctx.fillRect(barX, barY, barWidth, barHeight);
+    ctx.strokeRect(barX, barY, barWidth, barHeight);
+    ctx.fillStyle = 'green';
+    ctx.fillRect(barX, barY, barWidth * row[3] / 1000, barHeight);
+  }
+
+  for (const row of current.values()) {
+    const target = positions.get(row[4]);
+    if (row[5] && target) drawArrow(positions.get(row[0]), target, row[5]);
+  }
+  status.textContent = 'Frame ' + (index + 1) + ' / ' + frames;
+}
+
+let playing = true, time = 0, last = null;
+playButton.onclick = () => { playing = !playing; playButton.textContent = playing ? 'Pause' : 'Play'; };
+seek.oninput = () => { time = Number(seek.value) * data.frameDuration; };
+
+function tick(now) {
+  if (last !== null && playing) time += (now - last) / 1000 * Number(speedSelect.value);
+  last = now;
+  time %= frames * data.frameDuration;
+  const progress = time / data.frameDuration, frame = Math.floor(progress);
+  if (frame !== index) goTo(frame);
+  if (playing) seek.value = frame;
+  draw(progress - frame);
+  requestAnimationFrame(tick);
+}
+requestAnimationFrame(tick);
+</script>
+</body>
+</html>
+"""
@@ -0,0 +1,310 @@
+import multiprocessing
+from collections import deque
+from multiprocessing import shared_memory
+import numpy as np
+from battlefield import BattleField, Troop, CHUNK_SIZE, STAGNATION_THRESHOLD
+from simultaneous import decide, counter_seed
+
+ACTIONS = ('idle', 'attacking', 'waiting', 'moving')
+
+# Commands the coordinator hands to the workers between barriers
+STOP = 0
+DECIDE = 1
+RESOLVE = 2
+
+STAT_FIELDS = ('attack', 'speed', 'attack_range', 'vision_range', 'cooldown')
+
+
+def _attach(layout):
+    """Map every shared array described by layout: {name: (shm_name, dtype, shape)}"""
+    blocks = {}
+    arrays = {}
+    for name, (shm_name, dtype, shape) in layout.items():
+        blocks[name] = shared_memory.SharedMemory(name=shm_name)
+        arrays[name] = np.ndarray(shape, dtype=dtype, buffer=blocks[name].buf)
+    return blocks, arrays
+
+
+def _worker(index, bounds, halo, chunk_size, key, layout, barrier):
+    """
+    Owns the troops whose x lies in [bounds[0], bounds[1]) at the start of each
+    tick, and reads the troops within halo cells on either side.
+    """
+    blocks, a = _attach(layout)
+    low, high = bounds
+    local = BattleField(1, 1, chunk_size=chunk_size)  # Only used for its enemy search
+    troops = {}
+
+    try:
+        while True:
+            barrier.wait()
+            command = int(a['control'][0])
+            if command == STOP:
+                break
+            tick = int(a['control'][1])
+            x, y, active = a['x'], a['y'], a['active']
+
+            if command == DECIDE:
+                in_halo = np.flatnonzero(active & (x >= low - halo) & (x < high + halo))
+                local.troops = []
+                for troop_id in in_halo.tolist():
+                    troop = troops.get(troop_id)
+                    if troop is None:
+                        stats = (1,) + tuple(a[name][troop_id].item() for name in STAT_FIELDS)
+                        troop = troops[troop_id] = Troop(stats, None, bool(a['team'][troop_id]))
+                        troop.id = troop_id
+                    troop.position = (x[troop_id].item(), y[troop_id].item())
+                    troop.cooldown_timer = a['cooldown_timer'][troop_id].item()
+                    local.troops.append(troop)
+                local.rebuild_chunks()
+
+                for troop_id in np.flatnonzero(active & (x >= low) & (x < high)).tolist():
+                    troop = troops[troop_id]
+                    enemy, distance = local.get_closest_enemy(troop, troop.vision_range)
+                    _, action, target_id, damage, _, intended, cooldown_timer = decide(
+                        troop, enemy, distance, key, tick)
+                    a['action'][troop_id] = ACTIONS.index(action)
+                    a['target'][troop_id] = -1 if target_id is None else target_id
+                    a['damage'][troop_id] = damage
+                    a['intended_x'][troop_id], a['intended_y'][troop_id] = intended
+                    a['next_cooldown'][troop_id] = cooldown_timer
+
+            elif command == RESOLVE:
+                # One round of simultaneous.resolve_moves for this strip. Lower-id movers
+                # owned elsewhere count with their finals from the previous round.
+                window = active & (x >= low - halo) & (x < high + halo)
+                moved = (a['intended_x'] != x) | (a['intended_y'] != y)
+                claimed = set(zip(x[window & ~moved].tolist(), y[window & ~moved].tolist()))
+                changed = False
+                for troop_id in np.flatnonzero(window & moved).tolist():
+                    if low <= x[troop_id] < high:
+                        original = (x[troop_id].item(), y[troop_id].item())
+                        final_x, final_y = a['intended_x'][troop_id].item(), a['intended_y'][troop_id].item()
+                        if (final_x, final_y) in claimed:
+                            if a['collision_axis'][troop_id] == 0:
+                                final_x += 1 if original[0] > final_x else -1
+                            else:
+                                final_y += 1 if original[1] > final_y else -1
+                        if (final_x, final_y) != (a['final_x'][troop_id], a['final_y'][troop_id]):
+                            changed = True
+                        a['next_final_x'][troop_id] = final_x
+                        a['next_final_y'][troop_id] = final_y
+                        claimed.add((final_x, final_y))
+                    else:
+                        claimed.add((a['final_x'][troop_id].item(), a['final_y'][troop_id].item()))
+                a['changed'][index] = changed
+
+            barrier.wait()
+    finally:
+        for block in blocks.values():
+            block.close()
+
+
+class DomainBattle:
+    """
+    Runs a battlefield in simultaneous update mode across worker processes.
+
+    The field is cut into vertical strips, one per worker. Troop state lives in
+    shared memory, indexed by troop id. Each tick a worker decides for the
+    troops currently in its strip, reading the troops within a halo as wide as
+    the largest vision range (or the farthest a move conflict can reach), so
+    troops migrate between strips simply by moving. Cell conflicts are settled
+    in rounds: each strip replays resolve_moves for its movers, taking other
+    strips' movers from the previous round, until no final cell changes. That
+    fixed point is the id-ordered result of resolve_moves, so every tick matches
+    BattleField(update_mode='simultaneous') on the same seed.
+
+    Use as a context manager, or call close(), so the workers and shared
+    memory are released.
+    """
+
+    def __init__(self, battlefield, workers=4):
+        if battlefield.idle_wake_interval:
+            raise ValueError("DomainBattle does not support sleeping troops (idle_wake_interval)")
+        self.battlefield = battlefield
+        self.key = battlefield.counter_key
+        if self.key is None:
+            self.key = counter_seed(battlefield.seed if battlefield.seed is not None
+                                    else battlefield.rng.getrandbits(64))
+        self.tick = battlefield.tick
+
+        registry = battlefield.troop_registry
+        count = len(registry)
+        in_list = {troop.id for troop in battlefield.troops}
+        health = np.array([troop.health for troop in registry])
+        attack = np.array([troop.attack for troop in registry])
+        damage_dtype = np.result_type(health.dtype, attack.dtype) if count else np.int64
+        specs = {
+            'x': (np.int64, [troop.position[0] for troop in registry]),
+            'y': (np.int64, [troop.position[1] for troop in registry]),
+            'health': (damage_dtype, health),
+            'cooldown_timer': (np.int64, [troop.cooldown_timer for troop in registry]),
+            'team': (np.bool_, [bool(troop.team) for troop in registry]),
+            'active': (np.bool_, [troop.id in in_list for troop in registry]),
+            'action': (np.int8, [0] * count),
+            'target': (np.int64, [-1] * count),
+            'damage': (damage_dtype, [0] * count),
+            'intended_x': (np.int64, [0] * count),
+            'intended_y': (np.int64, [0] * count),
+            'next_cooldown': (np.int64, [0] * count),
+            'collision_axis': (np.int8, [0] * count),
+            'final_x': (np.int64, [0] * count),
+            'final_y': (np.int64, [0] * count),
+            'next_final_x': (np.int64, [0] * count),
+            'next_final_y': (np.int64, [0] * count),
+            'changed': (np.bool_, [False] * workers),
+            'control': (np.int64, [0, 0]),
+        }
+        for name in STAT_FIELDS:
+            specs[name] = (np.int64, [getattr(troop, name) for troop in registry])
+
+        self._blocks = {}
+        self.arrays = {}
+        layout = {}
+        for name, (dtype, values) in specs.items():
+            values = np.asarray(values, dtype=dtype)
+            block = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            array = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+            array[:] = values
+            self._blocks[name] = block
+            self.arrays[name] = array
+            layout[name] = (block.name, values.dtype.str, values.shape)
+
+        # Halo: the farthest an enemy can be seen, or a mover's final cell can land
+        max_vision = max((troop.vision_range for troop in registry), default=0)
+        max_speed = max((troop.speed for troop in registry), default=0)
+        halo = max(max_vision, 2 * max_speed + 2)
+
+        edges = [battlefield.width * i // workers for i in range(workers + 1)]
+        edges[0], edges[-1] = float('-inf'), float('inf')
+        self._barrier = multiprocessing.Barrier(workers + 1)
+        self._workers = [
+            multiprocessing.Process(target=_worker, daemon=True,
+                                    args=(index, (edges[index], edges[index + 1]), halo,
+                                          battlefield.chunk_size or CHUNK_SIZE, self.key, layout, self._barrier))
+            for index in range(workers)
+        ]
+        for process in self._workers:
+            process.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _phase(self, command):
+        self.arrays['control'][:] = (command, self.tick)
+        self._barrier.wait()  # Workers start
+        self._barrier.wait()  # Workers done
+
+    def update(self):
+        """Advance one simultaneous tick"""
+        from simultaneous import counter_random, COLLISION_STREAM
+        a = self.arrays
+        self.tick += 1
+        a['active'] &= a['health'] > 0
+
+        self._phase(DECIDE)
+
+        # Collision axes only matter for movers; draw them once for every strip
+        movers = np.flatnonzero(a['active'] & ((a['intended_x'] != a['x']) | (a['intended_y'] != a['y'])))
+        for troop_id in movers.tolist():
+            a['collision_axis'][troop_id] = counter_random(self.key, self.tick, troop_id, COLLISION_STREAM) & 1
+
+        # Settle cell conflicts, starting from everyone getting the cell they want
+        a['final_x'][:] = a['intended_x']
+        a['final_y'][:] = a['intended_y']
+        while True:
+            a['next_final_x'][:] = a['final_x']
+            a['next_final_y'][:] = a['final_y']
+            self._phase(RESOLVE)
+            a['final_x'][:] = a['next_final_x']
+            a['final_y'][:] = a['next_final_y']
+            if not a['changed'].any():
+                break
+
+        # Commit everything together, damage summed per target first
+        active = a['active']
+        a['x'][active] = a['final_x'][active]
+        a['y'][active] = a['final_y'][active]
+        a['cooldown_timer'][active] = a['next_cooldown'][active]
+        attackers = np.flatnonzero(active & (a['damage'] != 0))
+        totals = np.zeros_like(a['health'])
+        np.add.at(totals, a['target'][attackers], a['damage'][attackers])
+        a['health'] -= totals
+
+    def get_team_counts(self):
+        active, team = self.arrays['active'], self.arrays['team']
+        return int((active & team).sum()), int((active & ~team).sum())
+
+    def run(self, max_iterations=None, stagnation_threshold=STAGNATION_THRESHOLD, predict_confidence=None):
+        """
+        Headless BattleField.run: the same end conditions, with the final state
+        written back into the battlefield. Prediction checks write back every tick.
+        """
+        battlefield = self.battlefield
+        iteration = 0
+        troop_count_history = deque(maxlen=stagnation_threshold)
+        battlefield.outcome = {'reason': 'max_iterations', 'winner': None, 'predicted': False, 'confidence': 0.0}
+
+        while True:
+            if max_iterations is not None and iteration >= max_iterations:
+                break
+            self.update()
+
+            team_counts = self.get_team_counts()
+            troop_count_history.append(team_counts)
+            if len(troop_count_history) >= stagnation_threshold:
+                if all(counts == troop_count_history[0] for counts in troop_count_history):
+                    battlefield.outcome['reason'] = 'stagnation'
+                    break
+
+            if team_counts[0] == 0 or team_counts[1] == 0:
+                battlefield.outcome.update(reason='elimination', winner=team_counts[0] > 0, confidence=1.0)
+                break
+
+            if predict_confidence is not None:
+                self.write_back()
+                winner, confidence = battlefield.predict_winner()
+                if winner is not None and confidence >= predict_confidence:
+                    battlefield.outcome.update(reason='predicted', winner=winner, predicted=True,
+                                               confidence=confidence)
+                    break
+
+            iteration += 1
+
+        battlefield.outcome['iterations'] = iteration + 1
+        self.write_back()
+        return iteration + 1
+
+    def write_back(self):
+        """Copy the shared state into the battlefield's troops"""
+        a = self.arrays
+        battlefield = self.battlefield
+        registry = battlefield.troop_registry
+        for troop in registry:
+            troop.position = (a['x'][troop.id].item(), a['y'][troop.id].item())
+            troop.health = a['health'][troop.id].item()
+            troop.cooldown_timer = a['cooldown_timer'][troop.id].item()
+        if self.tick > battlefield.tick:
+            for troop in registry:
+                if a['active'][troop.id]:
+                    troop.action = ACTIONS[a['action'][troop.id]]
+                    target_id = a['target'][troop.id].item()
+                    troop.target = registry[target_id] if target_id >= 0 else None
+        battlefield.troops = [troop for troop in battlefield.troops if a['active'][troop.id]]
+        battlefield.tick = self.tick
+        battlefield._chunks_dirty = True
+
+    def close(self):
+        if self._workers:
+            self.arrays['control'][:] = (STOP, self.tick)
+            self._barrier.wait()
+            for process in self._workers:
+                process.join()
+            self._workers = []
+        for block in self._blocks.values():
+            block.close()
+            block.unlink()
+        self._blocks = {}
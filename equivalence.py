@@ -0,0 +1,310 @@
+import io
+import time
+import random
+import argparse
+import statistics
+import contextlib
+from battlefield import BattleField, Troop, CHUNK_SIZE
+from main import SCENARIOS
+
+IDLE_WAKE_INTERVAL = 10  # For the 'sleeping' engine
+DOMAIN_WORKERS = 2
+DIVERGENCE_SCORE = 3.0  # |z| or |t| above this counts as a different outcome distribution
+
+
+class FieldDriver:
+    """Advances a battlefield with BattleField.update"""
+
+    def __init__(self, battlefield):
+        self.battlefield = battlefield
+
+    def step(self):
+        self.battlefield.update()
+
+    def sync(self):
+        """Bring self.battlefield up to date before its state is read"""
+
+    def run(self, max_iterations):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.battlefield.run(max_iterations=max_iterations, render=False)
+
+    def close(self):
+        pass
+
+
+class BatchedDriver(FieldDriver):
+    """Advances a battlefield as a batch of one with BatchedBattles"""
+
+    def __init__(self, battlefield):
+        import numpy as np
+        from batch_engine import BatchedBattles
+        super().__init__(battlefield)
+        self.batch = BatchedBattles([battlefield])
+        self.running = np.ones(1, dtype=bool)
+
+    def step(self):
+        self.batch.update(self.running)
+
+    def sync(self):
+        self.batch.write_back()
+
+    def run(self, max_iterations):
+        self.batch.run(max_iterations=max_iterations)
+
+
+class DomainDriver(FieldDriver):
+    """Advances a simultaneous-mode battlefield with DomainBattle worker processes"""
+
+    def __init__(self, battlefield):
+        from domain_engine import DomainBattle
+        super().__init__(battlefield)
+        self.domain = DomainBattle(battlefield, workers=DOMAIN_WORKERS)
+
+    def step(self):
+        self.domain.update()
+
+    def sync(self):
+        self.domain.write_back()
+
+    def run(self, max_iterations):
+        self.domain.run(max_iterations=max_iterations)
+
+    def close(self):
+        self.domain.close()
+
+
+# Engine name -> (BattleField config overrides, driver)
+ENGINES = {
+    'reference': ({'chunk_size': None}, FieldDriver),
+    'chunked': ({'chunk_size': CHUNK_SIZE}, FieldDriver),
+    'sleeping': ({'idle_wake_interval': IDLE_WAKE_INTERVAL}, FieldDriver),
+    'batched': ({}, BatchedDriver),
+    'simultaneous': ({'update_mode': 'simultaneous'}, FieldDriver),
+    'domain': ({'update_mode': 'simultaneous'}, DomainDriver),
+    'flow_field': ({'movement': 'flow_field'}, FieldDriver),
+}
+
+# Candidate -> (engine it must agree with, 'tick' for identical states every tick
+# or 'outcome' for matching outcome distributions)
+CANDIDATES = {
+    'chunked': ('reference', 'tick'),
+    'batched': ('reference', 'tick'),
+    'sleeping': ('reference', 'outcome'),
+    'simultaneous': ('reference', 'outcome'),
+    'domain': ('simultaneous', 'tick'),
+    'flow_field': ('reference', 'outcome'),
+}
+
+# Engines that change the rules on purpose: their differences are reported but never fail a run
+REPORT_ONLY = {'simultaneous', 'flow_field'}
+
+
+def fuzz_battlefield(seed):
+    """A random battle: field size, army sizes, stats and (often crowded) positions all drawn from seed"""
+    rng = random.Random(seed)
+    width, height = rng.randint(8, 80), rng.randint(8, 80)
+    battlefield = BattleField(width, height)
+    for team in (True, False):
+        # Each army gathers around a few centres, so collisions are common
+        centres = [(rng.randrange(width), rng.randrange(height)) for _ in range(rng.randint(1, 3))]
+        for _ in range(rng.randint(1, 60)):
+            x, y = rng.choice(centres)
+            stats = (rng.randint(20, 200), rng.randint(5, 40), rng.randint(1, 3),
+                     rng.randint(1, 12), rng.randint(3, 100), rng.randint(0, 4))
+            battlefield.add_troop(Troop(stats, (x + rng.randint(-4, 4), y + rng.randint(-4, 4)), team))
+    return battlefield
+
+
+def scenario_checkpoint(scenario, seed):
+    """Build a seeded scenario ('fuzz' or a SCENARIOS name) and checkpoint it before the first tick"""
+    if scenario == 'fuzz':
+        battlefield = fuzz_battlefield(seed)
+    else:
+        random.seed(seed)
+        battlefield = SCENARIOS[scenario]()
+    battlefield.seed = seed
+    battlefield.rng = random.Random(seed)
+    return battlefield.checkpoint()
+
+
+def create_driver(engine, checkpoint):
+    """A driver for engine, starting from its own copy of the checkpoint"""
+    from simultaneous import counter_seed
+    overrides, driver = ENGINES[engine]
+    checkpoint = dict(checkpoint, config={**checkpoint['config'], **overrides})
+    if checkpoint['config']['update_mode'] == 'simultaneous' and checkpoint['counter_key'] is None:
+        checkpoint['counter_key'] = counter_seed(checkpoint['config']['seed'])
+    return driver(BattleField.from_checkpoint(checkpoint))
+
+
+def troop_state(battlefield):
+    """What must match between engines: the troops still in the battle and their state"""
+    return [(troop.id, troop.position, troop.health, troop.cooldown_timer) for troop in battlefield.troops]
+
+
+def first_difference(reference, candidate):
+    """(troop_id, reference entry, candidate entry) of the first mismatch between two troop_state lists"""
+    for index in range(max(len(reference), len(candidate))):
+        ref = reference[index] if index < len(reference) else None
+        cand = candidate[index] if index < len(candidate) else None
+        if ref != cand:
+            return ((ref or cand)[0], ref, cand)
+    return None
+
+
+def compare_ticks(reference, candidate, scenario, seed, ticks):
+    """
+    Step both engines side by side and compare troop_state after every tick.
+
+    Returns:
+        {'divergence': None or {...first mismatch...}, 'ticks': ticks compared,
+         'reference_time': s, 'candidate_time': s}
+    """
+    checkpoint = scenario_checkpoint(scenario, seed)
+    drivers = [create_driver(reference, checkpoint), create_driver(candidate, checkpoint)]
+    times = [0.0, 0.0]
+    result = {'divergence': None, 'ticks': 0}
+    try:
+        for tick in range(1, ticks + 1):
+            for index, driver in enumerate(drivers):
+                start = time.perf_counter()
+                driver.step()
+                times[index] += time.perf_counter() - start
+                driver.sync()
+            result['ticks'] = tick
+            states = [troop_state(driver.battlefield) for driver in drivers]
+            difference = first_difference(*states)
+            if difference is not None:
+                result['divergence'] = {'scenario': scenario, 'seed': seed, 'tick': tick, 'troop_id': difference[0],
+                                        'reference': difference[1], 'candidate': difference[2]}
+                break
+            if 0 in drivers[0].battlefield.get_team_counts():
+                break
+    finally:
+        for driver in drivers:
+            driver.close()
+    result['reference_time'], result['candidate_time'] = times
+    return result
+
+
+def play_out(engine, scenario, seed, max_iterations):
+    """Run one engine to the end and summarise the result"""
+    driver = create_driver(engine, scenario_checkpoint(scenario, seed))
+    try:
+        start = time.perf_counter()
+        driver.run(max_iterations)
+        elapsed = time.perf_counter() - start
+    finally:
+        driver.close()
+    battlefield = driver.battlefield
+    return {
+        'winner': battlefield.outcome['winner'],
+        'iterations': battlefield.outcome['iterations'],
+        'survivors': len(battlefield.troops),
+        'time': elapsed,
+    }
+
+
+def _difference_score(reference, candidate):
+    """Welch's t for the difference in means (0 when both samples are constant and equal)"""
+    spread = (statistics.pvariance(reference) / len(reference) + statistics.pvariance(candidate) / len(candidate)) ** 0.5
+    difference = statistics.fmean(candidate) - statistics.fmean(reference)
+    if spread == 0:
+        return 0.0 if difference == 0 else float('inf')
+    return difference / spread
+
+
+def compare_outcomes(reference, candidate, scenario, seeds, max_iterations):
+    """
+    Play both engines out on every seed and compare the outcome distributions:
+    share of battles won by team True, iterations and survivors.
+    """
+    results = {engine: [play_out(engine, scenario, seed, max_iterations) for seed in seeds]
+               for engine in (reference, candidate)}
+    summary = {'scenario': scenario, 'battles': len(seeds)}
+    for field in ('winner', 'iterations', 'survivors'):
+        samples = {engine: [float(row[field] is True) if field == 'winner' else row[field] for row in rows]
+                   for engine, rows in results.items()}
+        summary[field] = (statistics.fmean(samples[reference]), statistics.fmean(samples[candidate]),
+                          _difference_score(samples[reference], samples[candidate]))
+    summary['divergent'] = any(abs(summary[field][2]) > DIVERGENCE_SCORE
+                               for field in ('winner', 'iterations', 'survivors'))
+    summary['reference_time'] = sum(row['time'] for row in results[reference])
+    summary['candidate_time'] = sum(row['time'] for row in results[candidate])
+    return summary
+
+
+def check(candidate, scenarios, seeds, ticks=300, max_iterations=500, mode=None):
+    """
+    Check a candidate engine against its reference (see CANDIDATES) on every
+    scenario and seed, per tick or by outcome distribution.
+
+    Returns:
+        List of per-scenario reports; tick reports stop at the first divergence
+    """
+    reference, default_mode = CANDIDATES[candidate]
+    mode = mode or default_mode
+    reports = []
+    for scenario in scenarios:
+        if mode == 'outcome':
+            reports.append(compare_outcomes(reference, candidate, scenario, seeds, max_iterations))
+            continue
+        report = {'scenario': scenario, 'battles': 0, 'ticks': 0, 'divergence': None,
+                  'reference_time': 0.0, 'candidate_time': 0.0}
+        for seed in seeds:
+            result = compare_ticks(reference, candidate, scenario, seed, ticks)
+            report['battles'] += 1
+            report['ticks'] += result['ticks']
+            report['reference_time'] += result['reference_time']
+            report['candidate_time'] += result['candidate_time']
+            if result['divergence'] is not None:
+                report['divergence'] = result['divergence']
+                break
+        reports.append(report)
+    return reports
+
+
+def format_report(candidate, report):
+    reference = CANDIDATES[candidate][0]
+    speedup = report['reference_time'] / report['candidate_time'] if report['candidate_time'] else float('inf')
+    line = f"{candidate} vs {reference} on {report['scenario']} ({report['battles']} battles): "
+    if 'divergent' in report:
+        line += "outcomes differ" if report['divergent'] else "outcomes agree"
+        line += "".join(f", {field} {ref:.2f} vs {cand:.2f} (score {score:+.1f})"
+                        for field, (ref, cand, score) in ((field, report[field])
+                                                           for field in ('winner', 'iterations', 'survivors')))
+    elif report['divergence'] is None:
+        line += f"identical over {report['ticks']} ticks"
+    else:
+        d = report['divergence']
+        line += (f"DIVERGED at seed {d['seed']} tick {d['tick']} troop {d['troop_id']}: "
+                 f"reference {d['reference']} vs candidate {d['candidate']}")
+    line += f", {speedup:.2f}x speed"
+    if candidate in REPORT_ONLY:
+        line += " (report only)"
+    return line
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check alternate simulation engines against the reference")
+    parser.add_argument('--engines', nargs='+', default=list(CANDIDATES), choices=list(CANDIDATES))
+    parser.add_argument('--scenarios', nargs='+', default=list(SCENARIOS) + ['fuzz'],
+                        choices=list(SCENARIOS) + ['fuzz'])
+    parser.add_argument('--seeds', type=int, default=20, help="Seeded battles per scenario")
+    parser.add_argument('--ticks', type=int, default=300, help="Ticks compared per battle in tick mode")
+    parser.add_argument('--max-iterations', type=int, default=500, help="Iteration cap in outcome mode")
+    parser.add_argument('--mode', choices=('tick', 'outcome'), default=None,
+                        help="Override each engine's comparison (default: see CANDIDATES)")
+    args = parser.parse_args()
+
+    failed = False
+    for candidate in args.engines:
+        for report in check(candidate, args.scenarios, range(args.seeds), args.ticks, args.max_iterations, args.mode):
+            print(format_report(candidate, report))
+            if candidate not in REPORT_ONLY:
+                failed = failed or report.get('divergent') or report.get('divergence') is not None
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+import os
+import pickle
+
+KEYFRAME_INTERVAL = 50  # Frames between full keyframes in a delta recording
+RING_FRAMES = 1000  # Frames a ring recording keeps in memory
+
+
+class DeltaFrameRecording:
+    """
+    Frame recording that keeps a full keyframe every keyframe_interval frames
+    and only what changed in between: moved troops, damaged troops, deaths,
+    new troops and target changes.
+
+    It behaves like the list of frame dicts BattleField records by default:
+    len(), iteration and indexing return frames in the same format. Frame K is
+    rebuilt from the nearest keyframe at or before it. Rebuilt frames share the
+    troop dicts of troops that did not change, so per-troop time series built
+    from them cost memory only where something actually happened.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL):
+        self.keyframe_interval = keyframe_interval
+        self.keyframes = []  # Full frame dicts, one per keyframe_interval frames
+        self.deltas = []     # Per frame: None for a keyframe, otherwise the changes
+        self._previous = None
+
+    def __len__(self):
+        return len(self.deltas)
+
+    def append(self, frame_data):
+        if len(self.deltas) % self.keyframe_interval == 0:
+            self.keyframes.append(frame_data)
+            self.deltas.append(None)
+        else:
+            self.deltas.append(self._diff(self._previous, frame_data))
+        self._previous = frame_data
+
+    def __delitem__(self, index):
+        # Only dropping the tail is supported, as when a battle is restored to a checkpoint
+        if not isinstance(index, slice) or index.stop is not None or index.step is not None:
+            raise TypeError("only del recording[start:] is supported")
+        start = min(len(self), index.start or 0)
+        self._previous = self[start - 1] if start else None
+        del self.deltas[start:]
+        del self.keyframes[-(-start // self.keyframe_interval):]
+
+    def __iter__(self):
+        return self._replay(0)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("frame index out of range")
+
+        start = index - index % self.keyframe_interval
+        for offset, frame in enumerate(self._replay(start)):
+            if start + offset == index:
+                return frame
+
+    def timelines(self, num_troops):
+        """
+        Build per-troop time series straight from the deltas, in the layout of
+        BattleField.get_troop_timelines. Between changes a troop's slots all
+        point at the same dict, and nothing is done for troops that did not change.
+        """
+        num_frames = len(self)
+        troop_timelines = [[None] * num_frames for _ in range(num_troops)]
+        arrow_timelines = [[None] * num_frames for _ in range(num_troops)]
+        troops = {}
+        arrows = {}
+        arrow_states = {}
+        troop_since = {}  # troop_id -> frame index where its current dict took over
+        arrow_since = {}
+
+        def close(timelines, current, since, troop_id, end):
+            start = since.pop(troop_id)
+            timelines[troop_id][start:end] = [current[troop_id]] * (end - start)
+
+        for index, delta in enumerate(self.deltas):
+            if delta is None:
+                for troop_id in list(troop_since):
+                    close(troop_timelines, troops, troop_since, troop_id, index)
+                for troop_id in list(arrow_since):
+                    close(arrow_timelines, arrows, arrow_since, troop_id, index)
+                frame = self.keyframes[index // self.keyframe_interval]
+                troops = {troop['id']: troop for troop in frame['troops']}
+                arrows = {arrow['from_id']: arrow for arrow in frame['arrows']}
+                arrow_states = {troop_id: self._arrow_state(arrow, troops) for troop_id, arrow in arrows.items()}
+                troop_since = dict.fromkeys(troops, index)
+                arrow_since = dict.fromkeys(arrows, index)
+                continue
+
+            for troop_id in delta['removed']:
+                close(troop_timelines, troops, troop_since, troop_id, index)
+                del troops[troop_id]
+            for troop in delta['added']:
+                troops[troop['id']] = troop
+                troop_since[troop['id']] = index
+            for troop_id, position in delta['moved']:
+                close(troop_timelines, troops, troop_since, troop_id, index)
+                troops[troop_id] = {**troops[troop_id], 'position': position}
+                troop_since[troop_id] = index
+            for troop_id, health_ratio, alive in delta['damaged']:
+                if troop_since[troop_id] != index:
+                    close(troop_timelines, troops, troop_since, troop_id, index)
+                    troop_since[troop_id] = index
+                troops[troop_id] = {**troops[troop_id], 'health_ratio': health_ratio, 'alive': alive}
+
+            # Arrows change with their state or when either end moved
+            moved = {troop_id for troop_id, _ in delta['moved']}
+            affected = {troop_id for troop_id, _ in delta['targets']}
+            for troop_id, state in delta['targets']:
+                if state is None:
+                    del arrow_states[troop_id]
+                else:
+                    arrow_states[troop_id] = state
+            affected.update(troop_id for troop_id, state in arrow_states.items()
+                            if troop_id in moved or state[0] in moved)
+
+            for troop_id in affected:
+                if troop_id in arrow_since:
+                    close(arrow_timelines, arrows, arrow_since, troop_id, index)
+                    del arrows[troop_id]
+                state = arrow_states.get(troop_id)
+                if state is None:
+                    continue
+                to_id, color, stroke_style, to_pos = state
+                arrows[troop_id] = {
+                    'from_id': troop_id,
+                    'to_id': to_id,
+                    'from_pos': troops[troop_id]['position'],
+                    'to_pos': troops[to_id]['position'] if to_pos is None else to_pos,
+                    'color': color,
+                    'stroke_style': stroke_style
+                }
+                arrow_since[troop_id] = index
+
+        for troop_id in list(troop_since):
+            close(troop_timelines, troops, troop_since, troop_id, num_frames)
+        for troop_id in list(arrow_since):
+            close(arrow_timelines, arrows, arrow_since, troop_id, num_frames)
+        return troop_timelines, arrow_timelines
+
+    @staticmethod
+    def _arrow_state(arrow, troop_ids):
+        # Arrow ends normally follow the two troops' positions; the target's
+        # position is only stored when the target is not in the frame itself
+        to_pos = None if arrow['to_id'] in troop_ids else arrow['to_pos']
+        return (arrow['to_id'], arrow['color'], arrow['stroke_style'], to_pos)
+
+    def _diff(self, previous, frame_data):
+        """Describe frame_data as the changes since the previous frame"""
+        old_troops = {troop['id']: troop for troop in previous['troops']}
+        old_ids = set(old_troops)
+        new_ids = {troop['id'] for troop in frame_data['troops']}
+
+        moved = []
+        damaged = []
+        added = []
+        for troop in frame_data['troops']:
+            old = old_troops.pop(troop['id'], None)
+            if old is None:
+                added.append(troop)
+                continue
+            if troop['position'] != old['position']:
+                moved.append((troop['id'], troop['position']))
+            if troop['health_ratio'] != old['health_ratio'] or troop['alive'] != old['alive']:
+                damaged.append((troop['id'], troop['health_ratio'], troop['alive']))
+
+        old_arrows = {arrow['from_id']: self._arrow_state(arrow, old_ids) for arrow in previous['arrows']}
+        new_arrows = {arrow['from_id']: self._arrow_state(arrow, new_ids) for arrow in frame_data['arrows']}
+        targets = [(troop_id, state) for troop_id, state in new_arrows.items() if old_arrows.get(troop_id) != state]
+        targets.extend((troop_id, None) for troop_id in old_arrows if troop_id not in new_arrows)
+
+        return {
+            'frame_number': frame_data['frame_number'],
+            'moved': moved,
+            'damaged': damaged,
+            'added': added,
+            'removed': list(old_troops),
+            'targets': targets,
+        }
+
+    def _replay(self, start):
+        """Yield rebuilt frames from index start, which must be a keyframe"""
+        troops = {}
+        arrow_states = {}
+        arrows = {}
+
+        for index in range(start, len(self.deltas)):
+            delta = self.deltas[index]
+            if delta is None:
+                frame = self.keyframes[index // self.keyframe_interval]
+                troops = {troop['id']: troop for troop in frame['troops']}
+                arrow_states = {arrow['from_id']: self._arrow_state(arrow, troops) for arrow in frame['arrows']}
+                arrows = {arrow['from_id']: arrow for arrow in frame['arrows']}
+                yield frame
+                continue
+
+            troops = dict(troops)
+            for troop_id in delta['removed']:
+                del troops[troop_id]
+            for troop in delta['added']:
+                troops[troop['id']] = troop
+            for troop_id, position in delta['moved']:
+                troops[troop_id] = {**troops[troop_id], 'position': position}
+            for troop_id, health_ratio, alive in delta['damaged']:
+                troops[troop_id] = {**troops[troop_id], 'health_ratio': health_ratio, 'alive': alive}
+
+            arrow_states = dict(arrow_states)
+            for troop_id, state in delta['targets']:
+                if state is None:
+                    del arrow_states[troop_id]
+                else:
+                    arrow_states[troop_id] = state
+
+            # Rebuild arrows, reusing the previous dict when neither end moved
+            new_arrows = {}
+            for troop_id, (to_id, color, stroke_style, to_pos) in arrow_states.items():
+                from_pos = troops[troop_id]['position']
+                if to_pos is None:
+                    to_pos = troops[to_id]['position']
+                arrow = arrows.get(troop_id)
+                if (arrow is None or arrow['to_id'] != to_id or arrow['from_pos'] != from_pos
+                        or arrow['to_pos'] != to_pos or arrow['color'] != color
+                        or arrow['stroke_style'] != stroke_style):
+                    arrow = {
+                        'from_id': troop_id,
+                        'to_id': to_id,
+                        'from_pos': from_pos,
+                        'to_pos': to_pos,
+                        'color': color,
+                        'stroke_style': stroke_style
+                    }
+                new_arrows[troop_id] = arrow
+            arrows = new_arrows
+
+            # Troops are recorded in id order, which is the battlefield's list order
+            yield {
+                'frame_number': delta['frame_number'],
+                'troops': [troops[troop_id] for troop_id in sorted(troops)],
+                'arrows': [arrows[troop_id] for troop_id in sorted(arrows)]
+            }
+
+
+class RingFrameRecording(DeltaFrameRecording):
+    """
+    Delta recording that only keeps the most recent frames in memory.
+
+    At least keep_frames frames are kept. Older frames are dropped a whole
+    keyframe segment at a time, so memory stays bounded however long the
+    battle runs. With a spill_dir, the keyframe of each dropped segment is
+    pickled there first, leaving a sparse record of the whole battle on disk.
+
+    Like the other recordings it behaves as the list of frames it holds; start
+    is the overall index of the first of them.
+    """
+
+    def __init__(self, keep_frames=RING_FRAMES, keyframe_interval=KEYFRAME_INTERVAL, spill_dir=None):
+        super().__init__(keyframe_interval)
+        self.keep_frames = keep_frames
+        self.spill_dir = spill_dir
+        self.start = 0
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+
+    @property
+    def total(self):
+        """Frames recorded overall, including dropped ones"""
+        return self.start + len(self.deltas)
+
+    def append(self, frame_data):
+        super().append(frame_data)
+        while len(self.deltas) - self.keyframe_interval >= self.keep_frames:
+            keyframe = self.keyframes.pop(0)
+            if self.spill_dir:
+                with open(self._spill_path(self.start), 'wb') as f:
+                    pickle.dump(keyframe, f, protocol=pickle.HIGHEST_PROTOCOL)
+            del self.deltas[:self.keyframe_interval]
+            self.start += self.keyframe_interval
+
+    def rewind(self, total):
+        """
+        Drop every frame from overall index total on, as when a battle is restored to a
+        checkpoint. A total past the frames recorded (a new recording for a battle
+        restored from a checkpoint) makes the recording carry on from there instead.
+        """
+        if total >= self.total:
+            if total > self.total:
+                self._restart(total)
+            return
+        if total >= self.start:
+            del self[total - self.start:]
+        else:
+            # Everything held is newer; recording restarts from the checkpoint with a keyframe
+            self._restart(total)
+        # Only spills of frames this recording made get here, as total is below its own count
+        for index in self.spilled_frames():
+            if index >= total:
+                os.remove(self._spill_path(index))
+
+    def _restart(self, total):
+        self.keyframes = []
+        self.deltas = []
+        self._previous = None
+        self.start = total
+
+    def spilled_frames(self):
+        """Overall indices of the keyframes spilled to disk, oldest first"""
+        if not self.spill_dir or not os.path.isdir(self.spill_dir):
+            return []
+        return sorted(int(name[6:-4]) for name in os.listdir(self.spill_dir)
+                      if name.startswith('frame_') and name.endswith('.pkl'))
+
+    def load_spilled(self, index):
+        """Frame dict of a spilled keyframe, by overall index"""
+        with open(self._spill_path(index), 'rb') as f:
+            return pickle.load(f)
+
+    def _spill_path(self, index):
+        return os.path.join(self.spill_dir, f"frame_{index:08d}.pkl")
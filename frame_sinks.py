@@ -0,0 +1,157 @@
+import os
+import struct
+
+FAST_PNG_COMPRESS_LEVEL = 1  # zlib level for 'png_fast'; PIL's default is 6
+NPY_HEADER_SIZE = 128  # Bytes reserved for the .npy header, so the frame count can be rewritten in place
+VIDEO_FPS = 2
+HOLD_FRAMES = 5  # Times the first and last frames are repeated in the video
+
+
+class PNGSink:
+    """One PNG file per frame in the frames folder (the default)"""
+    streams_video = False
+
+    def __init__(self, output_folder, frames_folder, compress_level=None):
+        self.frames_folder = frames_folder
+        self.compress_level = compress_level
+
+    def write(self, image, frame_number):
+        path = os.path.join(self.frames_folder, f"frame_{frame_number:04d}.png")
+        if self.compress_level is None:
+            image.save(path)
+        else:
+            image.save(path, compress_level=self.compress_level)
+        return path
+
+    def frames(self, frame_counter):
+        """Yield (frame_number, RGB array) for the frames before frame_counter"""
+        import imageio
+        for i in range(1, frame_counter):
+            path = os.path.join(self.frames_folder, f"frame_{i:04d}.png")
+            if os.path.exists(path):
+                yield i, imageio.imread(path)
+
+    def close(self):
+        pass
+
+
+class NpySink:
+    """
+    All frames appended to one uint8 (frames, height, width, 3) .npy file.
+
+    The header is rewritten after every frame, so the file can be loaded (or
+    memory-mapped with np.load(path, mmap_mode='r')) at any time. Every frame
+    must have the same size.
+    """
+    streams_video = False
+
+    def __init__(self, output_folder, frames_folder):
+        self.path = os.path.join(output_folder, "frames.npy")
+        self.frame_numbers = []
+        self.size = None
+        self._file = None
+
+    def write(self, image, frame_number):
+        if self.size is None:
+            self.size = image.size
+            self._file = open(self.path, 'wb')
+            self._file.write(self._header(0))
+        elif image.size != self.size:
+            raise ValueError(f"Frame size {image.size} differs from the stack's {self.size}")
+        elif self._file is None:
+            # Closed by an earlier save_video(); later runs of the battle keep appending
+            self._file = open(self.path, 'r+b')
+            self._file.seek(0, os.SEEK_END)
+
+        self._file.write(image.tobytes())
+        self.frame_numbers.append(frame_number)
+        self._file.seek(0)
+        self._file.write(self._header(len(self.frame_numbers)))
+        self._file.seek(0, os.SEEK_END)
+        return self.path
+
+    def _header(self, count):
+        width, height = self.size
+        header = f"{{'descr': '|u1', 'fortran_order': False, 'shape': ({count}, {height}, {width}, 3), }}"
+        header = header.ljust(NPY_HEADER_SIZE - 11) + '\n'
+        return b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)) + header.encode('latin1')
+
+    def frames(self, frame_counter):
+        import numpy as np
+        if not self.frame_numbers:
+            return
+        if self._file is not None:
+            self._file.flush()
+        stack = np.load(self.path, mmap_mode='r')
+        for frame_number, frame in zip(self.frame_numbers, stack):
+            if frame_number < frame_counter:
+                yield frame_number, frame
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class VideoSink:
+    """
+    Frames piped straight into battle_simulation.mp4 as they are drawn, so
+    nothing is written per frame and nothing is decoded again afterwards.
+    Frames are held back by one, as the last one is only known at the end.
+    """
+    streams_video = True
+
+    def __init__(self, output_folder, frames_folder, fps=VIDEO_FPS):
+        self.path = os.path.join(output_folder, "battle_simulation.mp4")
+        self.fps = fps
+        self._writer = None
+        self._pending = None
+        self._emitted = None
+
+    def write(self, image, frame_number):
+        import numpy as np
+        if self._writer is None:
+            import imageio
+            self._writer = imageio.get_writer(self.path, fps=self.fps)
+        if self._pending is not None:
+            self._emit(*self._pending)
+        self._pending = (frame_number, np.asarray(image))
+        return self.path
+
+    def _emit(self, frame_number, frame, last=None):
+        # Same timing as BattleField.save_video: the first and last frames stay longer
+        count = HOLD_FRAMES if frame_number == 1 or frame_number == last else 1
+        for _ in range(count):
+            self._writer.append_data(frame)
+        self._emitted = (frame_number, frame, count)
+
+    def finish(self, last):
+        """Write the held-back frame, keeping only frames numbered up to last, and close the video"""
+        if self._writer is None:
+            return None
+        if self._pending is not None and self._pending[0] <= last:
+            self._emit(*self._pending, last)
+        self._pending = None
+        if self._emitted is not None and self._emitted[0] == last:
+            for _ in range(HOLD_FRAMES - self._emitted[2]):
+                self._writer.append_data(self._emitted[1])
+        self._writer.close()
+        self._writer = None
+        return self.path
+
+
+# Sink name -> (class, keyword arguments)
+FRAME_SINKS = {
+    'png': (PNGSink, {}),
+    'png_fast': (PNGSink, {'compress_level': FAST_PNG_COMPRESS_LEVEL}),
+    'npy': (NpySink, {}),
+    'video': (VideoSink, {}),
+}
+
+
+def create_frame_sink(name, output_folder, frames_folder):
+    """Create the frame sink registered under name"""
+    if name not in FRAME_SINKS:
+        raise ValueError(f"Unknown frame sink: {name!r} (available: {', '.join(sorted(FRAME_SINKS))})")
+    sink_class, options = FRAME_SINKS[name]
+    return sink_class(output_folder, frames_folder, **options)
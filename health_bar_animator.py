@@ -45,10 +45,9 @@ class HealthBarAnimator:
         health_y_values = []
         health_width_values = []
         opacity_values = []
+        timeline = self.battlefield.get_troop_timelines()[0][troop_id]
         
-        for frame in self.battlefield.animation_frames:
-            troop_data = self._find_troop_in_frame(frame, troop_id)
-            
+        for troop_data in timeline:
             if troop_data and troop_data['alive']:
                 # Troop is alive - show health bar
                 x = troop_data['position'][0] * scale
@@ -135,10 +134,3 @@ class HealthBarAnimator:
                 'dur': f'{total_duration}s',
                 'repeatCount': 'indefinite'
             })
-    
-    def _find_troop_in_frame(self, frame, troop_id):
-        """Find troop data in a frame by ID"""
-        for troop in frame['troops']:
-            if troop['id'] == troop_id:
-                return troop
-        return None
\ No newline at end of file
@@ -0,0 +1,170 @@
+import io
+import random
+import argparse
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+
+KINDS = ('occupancy', 'deaths')
+
+
+class Heatmap:
+    """
+    Per-cell counts of where troops stood and where they died, by team.
+
+    occupancy[team, y, x] counts troop-ticks spent on a cell, sampled every
+    `every` ticks and binned with one bincount per sampled tick; deaths[team, y, x]
+    counts troops of that team killed on the cell. Team index 0 is team False.
+    Positions off the field are not counted. The arrays have a fixed size, so
+    memory does not depend on how long battles run, and heatmaps of the same
+    field size can be merged, e.g. across worker processes.
+    """
+
+    def __init__(self, width, height, every=1):
+        self.width = width
+        self.height = height
+        self.every = every
+        self.occupancy = np.zeros((2, height, width), dtype=np.int64)
+        self.deaths = np.zeros((2, height, width), dtype=np.int64)
+        self.samples = 0  # Ticks sampled into occupancy
+        self.battles = 1
+
+    def hit(self, target, damage):
+        if target.health <= 0 < target.health + damage:
+            x, y = target.position
+            if 0 <= x < self.width and 0 <= y < self.height:
+                self.deaths[int(target.team), y, x] += 1
+
+    def end_tick(self, battlefield):
+        if battlefield.tick % self.every:
+            return
+        self.samples += 1
+        living = [troop for troop in battlefield.troops if troop.health > 0]
+        if not living:
+            return
+        positions = np.array([troop.position for troop in living], dtype=np.int64)
+        teams = np.array([troop.team for troop in living], dtype=np.int64)
+        x, y = positions[:, 0], positions[:, 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        cells = (teams * self.height + y) * self.width + x
+        self.occupancy += np.bincount(cells[inside], minlength=self.occupancy.size).reshape(self.occupancy.shape)
+
+    def snapshot(self):
+        """Copy of the counts so far, for BattleField.checkpoint()"""
+        return {'occupancy': self.occupancy.copy(), 'deaths': self.deaths.copy(), 'samples': self.samples}
+
+    def restore(self, snapshot):
+        """Return to the counts of a snapshot taken from a heatmap of the same size"""
+        self.occupancy = snapshot['occupancy'].copy()
+        self.deaths = snapshot['deaths'].copy()
+        self.samples = snapshot['samples']
+
+    def merge(self, other):
+        """Add another heatmap of the same field size into this one"""
+        if (other.width, other.height) != (self.width, self.height):
+            raise ValueError(f"Cannot merge a {other.width}x{other.height} heatmap into {self.width}x{self.height}")
+        self.occupancy += other.occupancy
+        self.deaths += other.deaths
+        self.samples += other.samples
+        self.battles += other.battles
+        return self
+
+    def save(self, path):
+        """Save the counts as a .npz file (see load)"""
+        np.savez_compressed(path, occupancy=self.occupancy, deaths=self.deaths,
+                            info=np.array([self.every, self.samples, self.battles]))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        heatmap = cls(data['occupancy'].shape[2], data['occupancy'].shape[1], int(data['info'][0]))
+        heatmap.occupancy = data['occupancy']
+        heatmap.deaths = data['deaths']
+        heatmap.samples, heatmap.battles = int(data['info'][1]), int(data['info'][2])
+        return heatmap
+
+    def render(self, kind='occupancy', scale=4):
+        """
+        Draw one kind of count as an image in PNGRenderer's colours: each team's
+        colour is blended over the battlefield background with a strength that
+        grows with the log of the count.
+        """
+        from PIL import Image, ImageColor
+        from png_renderer import BACKGROUND_COLOR, team_color
+
+        counts = getattr(self, kind)
+        pixels = np.empty((self.height, self.width, 3))
+        pixels[:] = ImageColor.getrgb(BACKGROUND_COLOR)
+        for team in (0, 1):
+            weight = np.log1p(counts[team])
+            if weight.max() > 0:
+                weight = (weight / weight.max())[:, :, None]
+                pixels = pixels * (1 - weight) + np.array(ImageColor.getrgb(team_color(team))) * weight
+        image = Image.fromarray(pixels.round().astype(np.uint8), 'RGB')
+        return image.resize((self.width * scale, self.height * scale), Image.NEAREST)
+
+    def save_png(self, path, kind='occupancy', scale=4):
+        self.render(kind, scale).save(path)
+        return path
+
+
+def run_heatmaps(scenario, seeds, max_iterations, every):
+    """Play seeded headless battles of a main.py scenario and return their merged heatmap"""
+    from main import SCENARIOS
+    merged = None
+    for seed in seeds:
+        random.seed(seed)
+        battlefield = SCENARIOS[scenario]()
+        heatmap = battlefield.track_heatmap(every)
+        with contextlib.redirect_stdout(io.StringIO()):
+            battlefield.run(max_iterations=max_iterations, render=False)
+        merged = heatmap if merged is None else merged.merge(heatmap)
+    return merged
+
+
+def accumulate_heatmaps(scenario, runs, workers=None, max_iterations=500, every=1, first_seed=0, chunk=16):
+    """
+    Heatmap of `runs` seeded battles of a scenario, played in parallel worker
+    processes in chunks of `chunk` battles, each chunk returning one merged heatmap.
+    """
+    seeds = list(range(first_seed, first_seed + runs))
+    merged = None
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_heatmaps, scenario, seeds[start:start + chunk], max_iterations, every)
+                   for start in range(0, len(seeds), chunk)]
+        for done, future in enumerate(as_completed(futures), start=1):
+            heatmap = future.result()
+            merged = heatmap if merged is None else merged.merge(heatmap)
+            print(f"Finished chunk {done}/{len(futures)}")
+    return merged
+
+
+def main():
+    from main import SCENARIOS
+    parser = argparse.ArgumentParser(description="Occupancy and death heatmaps over many seeded battles")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    parser.add_argument('--runs', type=int, default=200, help="Seeded battles to play")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: one per CPU)")
+    parser.add_argument('--max-iterations', type=int, default=500)
+    parser.add_argument('--every', type=int, default=1, help="Sample positions every N ticks")
+    parser.add_argument('--first-seed', type=int, default=0)
+    parser.add_argument('--merge', nargs='*', default=[], help="Earlier .npz heatmaps to add in")
+    parser.add_argument('--output', default=None, help="Output prefix (default: <scenario>_heatmap)")
+    parser.add_argument('--scale', type=int, default=4, help="Pixels per cell")
+    args = parser.parse_args()
+
+    heatmap = accumulate_heatmaps(args.scenario, args.runs, args.workers, args.max_iterations, args.every,
+                                  args.first_seed)
+    for path in args.merge:
+        heatmap.merge(Heatmap.load(path))
+
+    prefix = args.output or f"{args.scenario}_heatmap"
+    heatmap.save(prefix + '.npz')
+    for kind in KINDS:
+        heatmap.save_png(f"{prefix}_{kind}.png", kind, args.scale)
+    print(f"{heatmap.battles} battles, {heatmap.samples} sampled ticks -> {prefix}.npz, "
+          + ", ".join(f"{prefix}_{kind}.png" for kind in KINDS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+import json
+import asyncio
+import threading
+
+LIVE_HOST = '127.0.0.1'  # The preview is only ever served to this machine
+LIVE_PORT = 8765
+
+# Arrow codes in the streamed rows
+ARROW_NONE = 0
+ARROW_ATTACK = 1   # Red solid
+ARROW_WAIT = 2     # Red dotted
+ARROW_MOVE = 3     # Yellow
+
+
+def frame_rows(frame):
+    """Compact per-troop rows: [id, x, y, health, team, is_archer, target_id, arrow]"""
+    arrows = {}
+    for arrow in frame['arrows']:
+        if arrow['color'] == 'yellow':
+            code = ARROW_MOVE
+        elif arrow['stroke_style'] == 'none':
+            code = ARROW_ATTACK
+        else:
+            code = ARROW_WAIT
+        arrows[arrow['from_id']] = (arrow['to_id'], code)
+
+    rows = []
+    for troop in frame['troops']:
+        target_id, code = arrows.get(troop['id'], (-1, ARROW_NONE))
+        rows.append([troop['id'], troop['position'][0], troop['position'][1],
+                     round(troop['health_ratio'], 3), int(bool(troop['team'])),
+                     int(troop['type'] == 'archer'), target_id, code])
+    return rows
+
+
+class LivePreviewServer:
+    """
+    Streams a running battle to a browser on localhost.
+
+    The server runs an asyncio loop in a background thread. It serves a small
+    canvas viewer at / and pushes state as Server-Sent Events at /events. Each
+    captured frame is handed over by reference, so the simulation never waits on
+    the network. Every client only gets the newest frame when it is ready for
+    more, as the changes since the last frame it received. Slow clients skip
+    intermediate frames instead of holding the battle up.
+    """
+
+    def __init__(self, battlefield, port=LIVE_PORT, scale=6):
+        self.battlefield = battlefield
+        self.port = port
+        self.scale = scale
+        self._latest = None
+        self._clients = set()
+        self._handlers = set()  # Connection tasks still running, cancelled by stop()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._ready = threading.Event()
+        self._error = None  # Why the server thread failed to start, raised again by start()
+
+    def start(self):
+        """Start serving and subscribe to the battlefield's captured frames"""
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self._thread.join()
+            raise self._error
+        self.battlefield.frame_listeners.append(self.publish)
+        print(f"Live preview at http://{LIVE_HOST}:{self.port}/")
+        return self
+
+    def stop(self):
+        if self.publish in self.battlefield.frame_listeners:
+            self.battlefield.frame_listeners.remove(self.publish)
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop = None
+
+    def publish(self, frame_data):
+        """Called from the simulation thread; only swaps a reference and wakes the clients"""
+        self._latest = frame_data
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._wake_clients)
+
+    def _wake_clients(self):
+        for wake in self._clients:
+            wake.set()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, LIVE_HOST, self.port))
+        except OSError as error:
+            # E.g. the port is taken; hand the error to start() instead of leaving it waiting
+            self._error = error
+            self._loop.close()
+            self._loop = None
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            self._loop.run_forever()
+        finally:
+            self._server.close()
+            # Event streams never end on their own, and wait_closed() waits for them
+            handlers = list(self._handlers)
+            for task in handlers:
+                task.cancel()
+            self._loop.run_until_complete(asyncio.gather(*handlers, return_exceptions=True))
+            self._loop.run_until_complete(self._server.wait_closed())
+            self._loop.close()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            request_line = (await reader.readline()).decode('latin-1')
+            # Skip the headers, nothing in them matters here
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.split()
+            path = parts[1] if len(parts) > 1 else '/'
+
+            if path == '/events':
+                await self._stream(writer)
+            elif path == '/':
+                body = VIEWER_HTML.encode('utf-8')
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/html; charset=utf-8\r\n'
+                             b'Content-Length: ' + str(len(body)).encode() + b'\r\nConnection: close\r\n\r\n' + body)
+                await writer.drain()
+            else:
+                writer.write(b'HTTP/1.1 404 Not Found\r\nContent-Length: 0\r\nConnection: close\r\n\r\n')
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # Cancelled by stop(); end normally, as asyncio's stream callback chokes on a cancelled task
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+    async def _stream(self, writer):
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n')
+        info = {'width': self.battlefield.width, 'height': self.battlefield.height, 'scale': self.scale}
+        writer.write(f"event: info\ndata: {json.dumps(info)}\n\n".encode('utf-8'))
+        await writer.drain()
+
+        wake = asyncio.Event()
+        self._clients.add(wake)
+        sent = {}  # troop_id -> row as this client last saw it
+        try:
+            if self._latest is not None:
+                wake.set()
+            while True:
+                await wake.wait()
+                wake.clear()
+                frame = self._latest
+                rows = {row[0]: row for row in frame_rows(frame)}
+                changed = [row for troop_id, row in rows.items() if sent.get(troop_id) != row]
+                removed = [troop_id for troop_id in sent if troop_id not in rows]
+                sent = rows
+                message = json.dumps({'f': frame['frame_number'], 'u': changed, 'r': removed},
+                                     separators=(',', ':'))
+                writer.write(f"data: {message}\n\n".encode('utf-8'))
+                # Frames published while this waits are skipped, only the latest is sent next
+                await writer.drain()
+        finally:
+            self._clients.discard(wake)
+
+
+VIEWER_HTML = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Live Battle</title>
+<style>
+  body { margin: 0; background: #222; color: #ddd; font-family: sans-serif; }
+  #status { padding: 4px 8px; }
+</style>
+</head>
+<body>
+<div id="status">Waiting for battle...</div>
+<canvas id="board"></canvas>
+<script>
+const canvas = document.getElementById('board');
+const ctx = canvas.getContext('2d');
+const status = document.getElementById('status');
+const troops = new Map();
+let scale = 6, frame = 0, dirty = false;
+
+const source = new EventSource('/events');
+source.addEventListener('info', (event) => {
+  const info = JSON.parse(event.data);
+  scale = info.scale;
+  canvas.width = info.width * scale;
+  canvas.height = info.height * scale;
+});
+source.onmessage = (event) => {
+  const delta = JSON.parse(event.data);
+  for (const row of delta.u) troops.set(row[0], row);
+  for (const id of delta.r) troops.delete(id);
+  frame = delta.f;
+  dirty = true;
+};
+source.onerror = () => { status.textContent = 'Frame ' + frame + ' (disconnected)'; };
+
+function draw() {
+  if (dirty) {
+    dirty = false;
+    ctx.fillStyle = '#8B4513';
+    ctx.fillRect(0, 0, canvas.width, canvas.height);
+    const size = scale * 0.7;
+    for (const [id, x, y, health, team, archer] of troops.values()) {
+      ctx.fillStyle = team === 0 ? '#0080FF' : '#FF4040';
+      ctx.strokeStyle = 'black';
+      ctx.beginPath();
+      if (archer) ctx.rect(x * scale - size / 2, y * scale - size / 2, size, size);
+      else ctx.arc(x * scale, y * scale, size / 2, 0, 2 * Math.PI);
+      ctx.fill();
+      ctx.stroke();
+      const barWidth = scale * 0.8, barHeight = Math.max(scale * 0.15, 1);
+      const barX = x * scale - barWidth / 2, barY = y * scale - size / 2 - barHeight - 2;
+      ctx.fillStyle = 'red';
+      ctx.fillRect(barX, barY, barWidth, barHeight);
+      ctx.fillStyle = 'green';
+      ctx.fillRect(barX, barY, barWidth * health, barHeight);
+    }
+    ctx.lineWidth = 1;
+    for (const [id, x, y, health, team, archer, targetId, arrow] of troops.values()) {
+      const target = troops.get(targetId);
+      if (!arrow || !target) continue;
+      ctx.strokeStyle = arrow === 3 ? 'yellow' : 'red';
+      ctx.setLineDash(arrow === 2 ? [3, 3] : []);
+      ctx.beginPath();
+      ctx.moveTo(x * scale, y * scale);
+      ctx.lineTo(target[1] * scale, target[2] * scale);
+      ctx.stroke();
+    }
+    ctx.setLineDash([]);
+    status.textContent = 'Frame ' + frame + ' - ' + troops.size + ' troops';
+  }
+  requestAnimationFrame(draw);
+}
+requestAnimationFrame(draw);
+</script>
+</body>
+</html>
+"""
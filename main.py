@@ -1,5 +1,6 @@
 import random
 from battlefield import BattleField, Troop, BARBARIAN, ARCHER
+from live_server import LivePreviewServer
 
 def create_random_battlefield(width=100, height=100, num_troops_per_team=20):
     """Create a battlefield with randomly placed troops"""
@@ -75,6 +76,14 @@ def asymmetric_battle(width=100, height=100):
     
     return battlefield
 
+# Scenario name -> builder, for tools that replay the stock battles by name
+# (they place troops with the global random module, so seed it first)
+SCENARIOS = {
+    'formation': create_formation_battle,
+    'asymmetric': asymmetric_battle,
+    'random': create_random_battlefield,
+}
+
 def main():
     print("Battle Simulation Options:")
     print("1. Random Battle (20 vs 20 mixed troops)")
@@ -115,6 +124,11 @@ def main():
     stagnation = input("Stagnation threshold (default 150): ").strip()
     stagnation_threshold = int(stagnation) if stagnation else 150
     
+    confidence = input("Stop early at prediction confidence (press Enter to play out): ").strip()
+    predict_confidence = float(confidence) if confidence else None
+    
+    live = input("Stream a live preview to the browser? (y/N): ").strip().lower() == "y"
+    
     # Show initial state
     team_counts = battlefield.get_team_counts()
     print(f"\nStarting battle:")
@@ -123,10 +137,13 @@ def main():
     print(f"Total troops: {sum(team_counts)}")
     print("\nRunning simulation...")
     
+    live_server = LivePreviewServer(battlefield).start() if live else None
+    
     # Run the simulation
     try:
         iterations = battlefield.run(max_iterations=max_iterations, 
-                                   stagnation_threshold=stagnation_threshold)
+                                   stagnation_threshold=stagnation_threshold,
+                                   predict_confidence=predict_confidence)
         
         # Show final results
         final_counts = battlefield.get_team_counts()
@@ -134,6 +151,8 @@ def main():
         print(f"Final state:")
         print(f"Team Blue: {final_counts[0]} troops remaining")
         print(f"Team Red: {final_counts[1]} troops remaining")
+        if battlefield.outcome['predicted']:
+            print(f"(Winner predicted with confidence {battlefield.outcome['confidence']:.3f})")
         
         if battlefield.png_renderer.output_folder:
             print(f"\nImages saved to: {battlefield.png_renderer.output_folder}")
@@ -142,6 +161,10 @@ def main():
     except KeyboardInterrupt:
         print("\nSimulation interrupted by user.")
         print(f"Ran for {battlefield.frame_counter - 1} iterations.")
+    
+    finally:
+        if live_server:
+            live_server.stop()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
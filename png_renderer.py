@@ -1,6 +1,15 @@
 import os
 import datetime
 from PIL import Image, ImageDraw
+from frame_sinks import create_frame_sink
+
+BACKGROUND_COLOR = '#8B4513'
+
+
+def team_color(team):
+    """Fill colour of a team's troops"""
+    return '#0080FF' if team == 0 else '#FF4040'
+
 
 class PNGRenderer:
     """Handles PNG image generation for battlefield frames"""
@@ -9,6 +18,9 @@ class PNGRenderer:
         self.battlefield = battlefield
         self.output_folder = None
         self.frames_folder = None
+        # Where drawn frames go (see frame_sinks.FRAME_SINKS); chosen before the first frame
+        self.frame_sink = 'png'
+        self.sink = None
     
     def _ensure_output_folders(self):
         """Create output folders if they don't exist"""
@@ -20,24 +32,37 @@ class PNGRenderer:
             # Create frames subfolder
             self.frames_folder = os.path.join(self.output_folder, "frames")
             os.makedirs(self.frames_folder, exist_ok=True)
+            self.sink = create_frame_sink(self.frame_sink, self.output_folder, self.frames_folder)
     
     def save_board_state(self, scale=20):
         """Save the current board state as a high-quality image"""
         self._ensure_output_folders()
         
+        # Only the viewport is rasterised, so huge fields stay within PIL limits
+        view_x, view_y, view_width, view_height = self.battlefield.get_viewport(scale, self.battlefield.focus_positions())
+        origin = (view_x * scale, view_y * scale)
+        
         # Create high-resolution image
-        img_width = self.battlefield.width * scale
-        img_height = self.battlefield.height * scale
-        img = Image.new('RGB', (img_width, img_height), '#8B4513') 
+        img_width = view_width * scale
+        img_height = view_height * scale
+        img = Image.new('RGB', (img_width, img_height), BACKGROUND_COLOR) 
         draw = ImageDraw.Draw(img)
         
+        # Skip troops outside the viewport (one cell margin for shapes on the edge)
+        def visible(position):
+            return (view_x - 1 <= position[0] <= view_x + view_width + 1 and
+                    view_y - 1 <= position[1] <= view_y + view_height + 1)
+        
+        visible_troops = [troop for troop in self.battlefield.troops if visible(troop.position)]
+        
         # Store arrow data for later drawing
         arrows_to_draw = []
         
         # Collect arrow data first
         for troop in self.battlefield.troops:
             if hasattr(troop, 'target') and troop.target and hasattr(troop, 'action'):
-                if troop.action in ['attacking', 'moving', 'waiting']:
+                if troop.action in ['attacking', 'moving', 'waiting'] and (
+                        visible(troop.position) or visible(troop.target.position)):
                     arrows_to_draw.append({
                         'from_pos': troop.position,
                         'to_pos': troop.target.position,
@@ -46,32 +71,29 @@ class PNGRenderer:
                     })
         
         # Draw troops
-        for troop in self.battlefield.troops:
-            self._draw_troop(draw, troop, scale)
+        for troop in visible_troops:
+            self._draw_troop(draw, troop, scale, origin)
         
         # Draw arrows on top of troops
         for arrow in arrows_to_draw:
-            self._draw_arrow(draw, arrow, scale)
+            self._draw_arrow(draw, arrow, scale, origin)
         
         # Save image
-        filename = os.path.join(self.frames_folder, f"frame_{self.battlefield.frame_counter:04d}.png")
-        img.save(filename)
-        
-        return filename
+        return self.sink.write(img, self.battlefield.frame_counter)
     
-    def _draw_troop(self, draw, troop, scale):
+    def _draw_troop(self, draw, troop, scale, origin=(0, 0)):
         """Draw a single troop with health bar"""
         x, y = troop.position
-        x_pixel = x * scale
-        y_pixel = y * scale
+        x_pixel = x * scale - origin[0]
+        y_pixel = y * scale - origin[1]
         
         # Determine color based on team
-        color = '#0080FF' if troop.team == 0 else '#FF4040'
+        color = team_color(troop.team)
         
         # Draw troop shape based on type
         size = int(scale * 0.7)
         
-        if troop.attack == 20:  # Barbarian - circle
+        if troop.unit == 'barbarian':  # Barbarian - circle
             draw.ellipse([x_pixel - size//2, y_pixel - size//2, 
                          x_pixel + size//2, y_pixel + size//2], 
                         fill=color, outline='black', width=2)
@@ -101,15 +123,15 @@ class PNGRenderer:
             draw.rectangle([bar_x, bar_y, bar_x + health_width, bar_y + bar_height], 
                           fill='green', outline=None)
     
-    def _draw_arrow(self, draw, arrow, scale):
+    def _draw_arrow(self, draw, arrow, scale, origin=(0, 0)):
         """Draw an arrow between two positions"""
         from_x, from_y = arrow['from_pos']
         to_x, to_y = arrow['to_pos']
         
-        from_x_pixel = from_x * scale
-        from_y_pixel = from_y * scale
-        to_x_pixel = to_x * scale
-        to_y_pixel = to_y * scale
+        from_x_pixel = from_x * scale - origin[0]
+        from_y_pixel = from_y * scale - origin[1]
+        to_x_pixel = to_x * scale - origin[0]
+        to_y_pixel = to_y * scale - origin[1]
         
         # Calculate direction for arrow positioning
         dx = to_x_pixel - from_x_pixel
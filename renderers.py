@@ -0,0 +1,29 @@
+import importlib
+
+# Renderer backends by name, as (module, class name). Modules are only imported
+# when a battlefield first uses the backend, so simulation-only processes never
+# load PIL, imageio or the SVG animators.
+RENDERERS = {
+    'png': ('png_renderer', 'PNGRenderer'),
+    'svg': ('svg_renderer', 'SVGRenderer'),
+    'canvas': ('canvas_renderer', 'CanvasRenderer'),
+}
+
+
+def register_renderer(name, module, class_name):
+    """
+    Make a renderer available as battlefield.renderer(name).
+
+    The class is imported from module on first use and constructed with the
+    battlefield as its only argument.
+    """
+    RENDERERS[name] = (module, class_name)
+
+
+def create_renderer(name, battlefield):
+    """Import a registered backend and build it for a battlefield"""
+    try:
+        module, class_name = RENDERERS[name]
+    except KeyError:
+        raise ValueError(f"Unknown renderer: {name!r} (registered: {', '.join(sorted(RENDERERS))})") from None
+    return getattr(importlib.import_module(module), class_name)(battlefield)
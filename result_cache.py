@@ -0,0 +1,174 @@
+import os
+import json
+import shutil
+import hashlib
+from battlefield import ENGINE_VERSION, STAGNATION_THRESHOLD
+
+RESULT_CACHE_DIR = 'battle_cache'
+RESULT_CACHE_MAX_BYTES = 2 * 1024 ** 3  # Total size before least recently used entries are evicted
+
+# Artifact name -> file name in the battle's output folder
+ARTIFACTS = {
+    'svg': 'battle_animation.svg',
+    'video': 'battle_simulation.mp4',
+    'player': 'battle_player.html',
+}
+
+
+def _target_id(troop):
+    target = getattr(troop, 'target', None)
+    return target.id if target is not None else None
+
+
+def battle_spec(battlefield, run_options):
+    """Everything that decides a battle's outcome and output, as plain JSON-able data"""
+    spec = {
+        'engine': ENGINE_VERSION,
+        'width': battlefield.width,
+        'height': battlefield.height,
+        'seed': battlefield.seed,
+        'idle_wake_interval': battlefield.idle_wake_interval,
+        'update_mode': battlefield.update_mode,
+        'viewport': battlefield.viewport,
+        'tick': battlefield.tick,
+        'frame_counter': battlefield.frame_counter,
+        'troops': [
+            [troop.max_health, troop.attack, troop.speed, troop.attack_range, troop.vision_range,
+             troop.cooldown, troop.health, troop.cooldown_timer, list(troop.position), troop.team,
+             troop.unit, _target_id(troop), getattr(troop, 'action', None)]
+            for troop in battlefield.troops
+        ],
+        'run': run_options,
+    }
+    if battlefield.movement != 'direct':
+        spec['movement'] = battlefield.movement
+    # A ring recording only renders its last frames
+    keep_frames = getattr(battlefield.animation_frames, 'keep_frames', None)
+    if keep_frames is not None:
+        spec['keep_frames'] = keep_frames
+    return spec
+
+
+def spec_key(spec):
+    """Content hash of a battle specification"""
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk cache of battle outcomes and their rendered output, keyed by a hash
+    of the full battle specification (see battle_spec).
+
+    Each entry is a directory holding outcome.json and the artifacts. Hits
+    refresh the entry's timestamp, and once the cache grows past max_bytes the
+    least recently used entries are removed. Only seeded battles are cached;
+    unseeded ones depend on the global random state and always run.
+    """
+
+    def __init__(self, cache_dir=RESULT_CACHE_DIR, max_bytes=RESULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.cache_dir, key)
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        entry_dir = self._entry_dir(key)
+        outcome_path = os.path.join(entry_dir, 'outcome.json')
+        try:
+            with open(outcome_path, encoding='utf-8') as f:
+                result = json.load(f)
+        except FileNotFoundError:
+            return None
+
+        os.utime(outcome_path)  # Mark as recently used
+        for name, filename in ARTIFACTS.items():
+            path = os.path.join(entry_dir, filename)
+            result[name] = path if os.path.exists(path) else None
+        result['cached'] = True
+        return result
+
+    def put(self, key, outcome, output_folder=None):
+        """Store an outcome and copy the artifacts found in output_folder"""
+        entry_dir = self._entry_dir(key)
+        temp_dir = entry_dir + '.tmp'
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        os.makedirs(temp_dir)
+
+        if output_folder:
+            for filename in ARTIFACTS.values():
+                path = os.path.join(output_folder, filename)
+                if os.path.exists(path):
+                    shutil.copyfile(path, os.path.join(temp_dir, filename))
+        with open(os.path.join(temp_dir, 'outcome.json'), 'w', encoding='utf-8') as f:
+            json.dump({'outcome': outcome}, f)
+
+        # Rename into place so readers never see a partial entry
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(temp_dir, entry_dir)
+        self.evict(keep=key)
+        return self.get(key)
+
+    def evict(self, keep=None):
+        """Remove least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        for key in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(key)
+            outcome_path = os.path.join(entry_dir, 'outcome.json')
+            if not os.path.exists(outcome_path):
+                continue
+            size = sum(entry.stat().st_size for entry in os.scandir(entry_dir) if entry.is_file())
+            entries.append((os.path.getmtime(outcome_path), key, size))
+            total += size
+
+        for _, key, size in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+            total -= size
+
+    def run(self, battlefield, max_iterations=None, stagnation_threshold=STAGNATION_THRESHOLD,
+            predict_confidence=None, render=True, animations=('svg', 'canvas')):
+        """
+        BattleField.run with caching.
+
+        On a hit the battlefield is not simulated at all; only battlefield.outcome
+        is set. Artifact paths point into the cache and stay valid until evicted.
+
+        Returns:
+            {'outcome': ..., 'svg': path, 'video': path, 'player': path, 'cached': bool},
+            with None for artifacts that were not written
+        """
+        run_options = {
+            'max_iterations': max_iterations,
+            'stagnation_threshold': stagnation_threshold,
+            'predict_confidence': predict_confidence,
+            'render': render,
+            'animations': list(animations),
+        }
+        key = spec_key(battle_spec(battlefield, run_options)) if battlefield.seed is not None else None
+
+        if key is not None:
+            result = self.get(key)
+            if result is not None:
+                battlefield.outcome = result['outcome']
+                print(f"Loaded cached battle result {key[:12]}")
+                return result
+
+        battlefield.run(**run_options)
+        output_folder = battlefield.png_renderer.output_folder if render else None
+        if key is None:
+            result = {'outcome': battlefield.outcome, 'cached': False}
+            for name, filename in ARTIFACTS.items():
+                path = os.path.join(output_folder, filename) if output_folder else None
+                result[name] = path if path and os.path.exists(path) else None
+            return result
+
+        result = self.put(key, battlefield.outcome, output_folder)
+        result['cached'] = False
+        return result
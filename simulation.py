@@ -1,10 +1,136 @@
 import arcade
 import math
+import numpy as np
+import heapq
 import random
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 600
 SCREEN_TITLE = "Battle Simulation"
+SPATIAL_HASH_CELL_SIZE = 128  # Pixels per spatial hash cell, as in arcade.SpriteList
+HEALTH_BAR_WIDTH = 30
+HEALTH_BAR_HEIGHT = 5
+HEALTH_BAR_OFFSET = 25  # Pixels above the troop's center
+PROJECTILE_TEXTURE = "arrow.png"
+PROJECTILE_SCALE = 0.5
+PROJECTILE_SPEED = 5
+PROJECTILE_HIT_RADIUS = 10
+FIXED_TIMESTEP = 1 / 60  # Seconds of game time per logic step
+
+
+class SpatialHash:
+    """Uniform grid of sprites for nearest-neighbour queries"""
+
+    def __init__(self, cell_size=SPATIAL_HASH_CELL_SIZE):
+        self.cell_size = cell_size
+        self.cells = {}  # (cell_x, cell_y) -> {sprite: (x, y)} as of the last add/update
+        self.keys = {}   # sprite -> cell it is stored in
+
+    def _key(self, x, y):
+        return (int(x // self.cell_size), int(y // self.cell_size))
+
+    def __len__(self):
+        return len(self.keys)
+
+    def add(self, sprite):
+        x, y = sprite.center_x, sprite.center_y
+        key = self._key(x, y)
+        self.cells.setdefault(key, {})[sprite] = (x, y)
+        self.keys[sprite] = key
+
+    def remove(self, sprite):
+        key = self.keys.pop(sprite)
+        cell = self.cells[key]
+        del cell[sprite]
+        if not cell:
+            del self.cells[key]
+
+    def update(self, sprite):
+        """Record a sprite's new position after it moved"""
+        x, y = sprite.center_x, sprite.center_y
+        key = self._key(x, y)
+        if self.keys[sprite] != key:
+            self.remove(sprite)
+            self.add(sprite)
+        else:
+            self.cells[key][sprite] = (x, y)
+
+    def nearest(self, x, y):
+        """Return (sprite, distance) for the sprite closest to (x, y), or (None, inf)"""
+        center_x, center_y = self._key(x, y)
+        remaining = len(self.cells)
+        closest = None
+        min_dist_sq = float('inf')
+
+        def scan(cell):
+            # Squared distances on the stored coordinates avoid sprite property lookups
+            nonlocal closest, min_dist_sq
+            for sprite, (sprite_x, sprite_y) in cell.items():
+                dist_sq = (sprite_x - x) ** 2 + (sprite_y - y) ** 2
+                if dist_sq < min_dist_sq:
+                    min_dist_sq = dist_sq
+                    closest = sprite
+
+        radius = 0
+        probed = 0
+        while remaining > 0:
+            # Cells in this ring or beyond can't be closer than this
+            bound = (radius - 1) * self.cell_size
+            if bound > 0 and bound * bound > min_dist_sq:
+                break
+            if probed >= remaining:
+                # Probing empty cells now costs more than visiting the occupied ones
+                # left, so visit those nearest first until none can be closer
+                size = self.cell_size
+                candidates = []
+                for (cell_x, cell_y), cell in self.cells.items():
+                    if max(abs(cell_x - center_x), abs(cell_y - center_y)) >= radius:
+                        gap_x = max(cell_x * size - x, 0, x - (cell_x + 1) * size)
+                        gap_y = max(cell_y * size - y, 0, y - (cell_y + 1) * size)
+                        candidates.append((gap_x * gap_x + gap_y * gap_y, cell_x, cell_y))
+                heapq.heapify(candidates)
+                while candidates and candidates[0][0] < min_dist_sq:
+                    _, cell_x, cell_y = heapq.heappop(candidates)
+                    scan(self.cells[(cell_x, cell_y)])
+                break
+            for cell_x in range(center_x - radius, center_x + radius + 1):
+                # Only the edge of the square ring is new at this radius
+                if cell_x in (center_x - radius, center_x + radius):
+                    cell_ys = range(center_y - radius, center_y + radius + 1)
+                else:
+                    cell_ys = (center_y - radius, center_y + radius) if radius else (center_y,)
+                for cell_y in cell_ys:
+                    probed += 1
+                    cell = self.cells.get((cell_x, cell_y))
+                    if cell:
+                        remaining -= 1
+                        scan(cell)
+            radius += 1
+
+        return closest, math.sqrt(min_dist_sq)
+
+
+class Team:
+    """One side's troops, with its living troops indexed for targeting"""
+
+    def __init__(self):
+        self.troops = arcade.SpriteList()
+        self.living = SpatialHash()
+
+    def append(self, troop):
+        troop.team = self
+        self.troops.append(troop)
+        if troop.health > 0:
+            self.living.add(troop)
+
+    def __iter__(self):
+        return iter(self.troops)
+
+    def on_death(self, troop):
+        self.living.remove(troop)
+
+    def nearest(self, x, y):
+        return self.living.nearest(x, y)
 
 
 class Troop(arcade.Sprite):
@@ -25,6 +151,7 @@ class Troop(arcade.Sprite):
         self.damage = damage
         self.is_ranged = is_ranged
         self.target = None
+        self.team = None  # Set when added to a Team
 
         # Attack timing
         self.attack_cooldown = 1.0
@@ -44,6 +171,12 @@ class Troop(arcade.Sprite):
             self.cur_frame = (self.cur_frame + 1) % len(frames)
             self.texture = frames[self.cur_frame]
 
+    def take_damage(self, damage):
+        was_alive = self.health > 0
+        self.health -= damage
+        if was_alive and self.health <= 0 and self.team:
+            self.team.on_death(self)
+
     def update_logic(self, enemies, projectiles, delta_time):
         if self.health <= 0:
             self.set_state("dead")
@@ -51,16 +184,12 @@ class Troop(arcade.Sprite):
 
         self.cooldown_timer -= delta_time
 
-        # Find living enemies
-        living_enemies = [e for e in enemies if e.health > 0]
-        if not living_enemies:
+        # Pick closest living target from the enemy team's spatial hash
+        self.target, dist = enemies.nearest(self.center_x, self.center_y)
+        if self.target is None:
             self.set_state("idle")
             return
 
-        # Pick closest target
-        self.target = min(living_enemies, key=lambda e: arcade.get_distance_between_sprites(self, e))
-        dist = arcade.get_distance_between_sprites(self, self.target)
-
         if dist <= self.attack_range:
             # Attack
             if self.cooldown_timer <= 0:
@@ -69,13 +198,10 @@ class Troop(arcade.Sprite):
 
                 if self.is_ranged:
                     # Shoot arrow
-                    arrow = Projectile("arrow.png", 0.5,
-                                       self.center_x, self.center_y,
-                                       self.target, self.damage)
-                    projectiles.append(arrow)
+                    projectiles.fire(self.center_x, self.center_y, self.target, self.damage)
                 else:
                     # Melee damage
-                    self.target.health -= self.damage
+                    self.target.take_damage(self.damage)
             else:
                 self.set_state("idle")
         else:
@@ -86,48 +212,218 @@ class Troop(arcade.Sprite):
             if length > 0:
                 self.center_x += (dx / length) * self.speed
                 self.center_y += (dy / length) * self.speed
+                if self.team:
+                    self.team.living.update(self)
+
+
+class HealthBars:
+    """Health bars for many troops, kept in one SpriteList and drawn in a single call"""
+
+    def __init__(self):
+        self.sprites = arcade.SpriteList()
+        self.bars = {}  # troop -> [background, foreground, (x, y, health) last drawn]
+
+    def add(self, troop):
+        background = arcade.SpriteSolidColor(HEALTH_BAR_WIDTH, HEALTH_BAR_HEIGHT, arcade.color.RED)
+        foreground = arcade.SpriteSolidColor(HEALTH_BAR_WIDTH, HEALTH_BAR_HEIGHT, arcade.color.GREEN)
+        self.sprites.append(background)
+        self.sprites.append(foreground)
+        self.bars[troop] = [background, foreground, None]
+
+    def update(self):
+        """Move and resize only the bars whose troop moved or lost health"""
+        for troop, bar in list(self.bars.items()):
+            background, foreground, drawn = bar
+            if troop.health <= 0:
+                background.remove_from_sprite_lists()
+                foreground.remove_from_sprite_lists()
+                del self.bars[troop]
+                continue
+
+            state = (troop.center_x, troop.center_y, troop.health)
+            if state == drawn:
+                continue
+            bar[2] = state
+
+            x, y = troop.center_x, troop.center_y + HEALTH_BAR_OFFSET
+            background.center_x = x
+            background.center_y = y
+            if drawn is None or drawn[2] != troop.health:
+                foreground.width = troop.health / troop.max_health * HEALTH_BAR_WIDTH
+            foreground.center_x = x - (HEALTH_BAR_WIDTH - foreground.width) / 2
+            foreground.center_y = y
 
     def draw(self):
-        super().draw()
-        if self.health > 0:
-            # Draw health bar
-            health_ratio = self.health / self.max_health
-            arcade.draw_rectangle_filled(self.center_x, self.center_y + 25, 30, 5, arcade.color.RED)
-            arcade.draw_rectangle_filled(self.center_x - 15 + health_ratio * 30 / 2,
-                                         self.center_y + 25,
-                                         health_ratio * 30, 5, arcade.color.GREEN)
+        self.sprites.draw()
 
 
 class Projectile(arcade.Sprite):
-    def __init__(self, texture, scale, x, y, target, damage):
-        super().__init__(texture, scale)
-        self.center_x = x
-        self.center_y = y
+    def __init__(self, texture, scale):
+        super().__init__(texture=texture, scale=scale)
+        self.target = None
+        self.damage = 0
+        self.speed = PROJECTILE_SPEED
+
+    def launch(self, x, y, target, damage):
+        self.position = (x, y)
         self.target = target
         self.damage = damage
-        self.speed = 5
+        self.visible = True
+
+
+class ProjectilePool:
+    """
+    Projectiles sharing one texture, recycled instead of re-created.
+
+    Every pooled sprite stays in the same SpriteList; retired ones are hidden
+    and handed out again by the next fire(). Live projectiles keep their
+    positions and speeds in numpy arrays, row for row with the active list, so
+    update() steps them all in one array operation.
+    """
+
+    def __init__(self, texture_file=PROJECTILE_TEXTURE, scale=PROJECTILE_SCALE):
+        self.texture_file = texture_file
+        self.texture = None  # Loaded on first shot
+        self.scale = scale
+        self.sprites = arcade.SpriteList()
+        self.active = []
+        self.positions = np.zeros((0, 2))
+        self.speeds = np.zeros(0)
+        self.launched = []  # (x, y, speed) fired since the last update
+        self.free = []
+
+    def __len__(self):
+        return len(self.active)
+
+    def fire(self, x, y, target, damage):
+        if self.free:
+            projectile = self.free.pop()
+        else:
+            if self.texture is None:
+                self.texture = arcade.load_texture(self.texture_file)
+            projectile = Projectile(self.texture, self.scale)
+            self.sprites.append(projectile)
+        projectile.launch(x, y, target, damage)
+        self.active.append(projectile)
+        self.launched.append((x, y, projectile.speed))
+
+    def _retire(self, projectile):
+        projectile.visible = False
+        projectile.target = None
+        self.free.append(projectile)
 
     def update(self):
-        if not self.target or self.target.health <= 0:
+        """Home every live projectile on its target in one array step"""
+        if self.launched:
+            launched = np.array(self.launched, dtype=float)
+            self.positions = np.concatenate([self.positions, launched[:, :2]])
+            self.speeds = np.concatenate([self.speeds, launched[:, 2]])
+            self.launched = []
+        if not self.active:
             return
-        dx, dy = self.target.center_x - self.center_x, self.target.center_y - self.center_y
-        dist = math.hypot(dx, dy)
-        if dist < 10:
-            self.target.health -= self.damage
-            self.remove_from_sprite_lists()
-        else:
-            self.center_x += (dx / dist) * self.speed
-            self.center_y += (dy / dist) * self.speed
+
+        targets = [projectile.target for projectile in self.active]
+        # Orphaned: the target died before the arrow arrived
+        alive = np.array([target is not None and target.health > 0 for target in targets])
+        aim = np.array([(target.center_x, target.center_y) if ok else (0.0, 0.0)
+                        for target, ok in zip(targets, alive)])
+        delta = aim - self.positions
+        dist = np.hypot(delta[:, 0], delta[:, 1])
+        hit = alive & (dist < PROJECTILE_HIT_RADIUS)
+        flying = alive & ~hit
+        step = np.divide(self.speeds, dist, out=np.zeros_like(dist), where=flying)
+        self.positions += delta * step[:, None]
+
+        for index in np.flatnonzero(~flying):
+            projectile = self.active[index]
+            # An earlier arrow this step may already have killed the target
+            if hit[index] and projectile.target.health > 0:
+                projectile.target.take_damage(projectile.damage)
+            self._retire(projectile)
+
+        keep = np.flatnonzero(flying)
+        self.active = [self.active[index] for index in keep]
+        self.positions = self.positions[keep]
+        self.speeds = self.speeds[keep]
+        for projectile, (x, y) in zip(self.active, self.positions.tolist()):
+            projectile.position = (x, y)
+
+    def draw(self):
+        self.sprites.draw()
+
+
+class BattleSimulation:
+    """
+    Real-time battle logic advanced in fixed timesteps, with no window needed.
+
+    Movement and projectile speeds are per step, so a fixed step keeps the
+    battle identical whatever the render frame rate. A window can run any
+    number of steps per frame through advance(), and batch code can call
+    step() or run() directly as fast as the CPU allows.
+    """
+
+    def __init__(self, timestep=FIXED_TIMESTEP, animate=True):
+        self.timestep = timestep
+        self.animate = animate  # Sprite animation frames are only needed when rendering
+        self.barbarians = Team()
+        self.archers = Team()
+        self.projectiles = ProjectilePool()
+        self.steps = 0
+        self.elapsed = 0.0
+        self._accumulator = 0.0
+
+    def step(self):
+        """Advance the battle by one fixed timestep"""
+        dt = self.timestep
+        for b in self.barbarians:
+            b.update_logic(self.archers, self.projectiles, dt)
+            if self.animate:
+                b.update_animation(dt)
+        for a in self.archers:
+            a.update_logic(self.barbarians, self.projectiles, dt)
+            if self.animate:
+                a.update_animation(dt)
+
+        self.projectiles.update()
+        self.steps += 1
+        self.elapsed += dt
+
+    def advance(self, seconds, max_steps=None):
+        """
+        Run every whole timestep that fits in the given game time.
+
+        Leftover time carries over to the next call. Returns the number of
+        steps taken, which may be zero.
+        """
+        self._accumulator += seconds
+        steps = 0
+        while self._accumulator >= self.timestep and (max_steps is None or steps < max_steps):
+            self.step()
+            self._accumulator -= self.timestep
+            steps += 1
+        return steps
+
+    def is_over(self):
+        return not len(self.barbarians.living) or not len(self.archers.living)
+
+    def run(self, max_seconds=None):
+        """Step headlessly until one side is wiped out or max_seconds of game time pass"""
+        while not self.is_over():
+            if max_seconds is not None and self.elapsed >= max_seconds:
+                break
+            self.step()
+        return self.steps
 
 
 class BattleGame(arcade.Window):
-    def __init__(self):
+    def __init__(self, speed=1.0, timestep=FIXED_TIMESTEP):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         arcade.set_background_color(arcade.color.DARK_SLATE_GRAY)
 
-        self.barbarians = arcade.SpriteList()
-        self.archers = arcade.SpriteList()
-        self.projectiles = arcade.SpriteList()
+        # Game seconds simulated per real second: 0 pauses, above 1 fast-forwards
+        self.speed = speed
+        self.simulation = BattleSimulation(timestep)
+        self.health_bars = HealthBars()
 
     def load_animations(self, prefix):
         # Normally you'd load real sprite sheets here
@@ -144,32 +440,27 @@ class BattleGame(arcade.Window):
 
         for i in range(5):
             b = Troop(barbarian_anim, 100, 100 + i * 80, 120, 1.5, 20, 15, False)
-            self.barbarians.append(b)
+            self.simulation.barbarians.append(b)
 
         for i in range(5):
             a = Troop(archer_anim, 700, 100 + i * 80, 80, 1.2, 200, 8, True)
-            self.archers.append(a)
+            self.simulation.archers.append(a)
+
+        for troop in [*self.simulation.barbarians, *self.simulation.archers]:
+            self.health_bars.add(troop)
 
     def on_draw(self):
         arcade.start_render()
-        self.barbarians.draw()
-        self.archers.draw()
-        self.projectiles.draw()
+        self.simulation.barbarians.troops.draw()
+        self.simulation.archers.troops.draw()
+        self.simulation.projectiles.draw()
 
-        for b in self.barbarians:
-            b.draw()
-        for a in self.archers:
-            a.draw()
+        # All health bars go out in one batched draw on top of the troops
+        self.health_bars.update()
+        self.health_bars.draw()
 
     def on_update(self, delta_time):
-        for b in self.barbarians:
-            b.update_logic(self.archers, self.projectiles, delta_time)
-            b.update_animation(delta_time)
-        for a in self.archers:
-            a.update_logic(self.barbarians, self.projectiles, delta_time)
-            a.update_animation(delta_time)
-
-        self.projectiles.update()
+        self.simulation.advance(delta_time * self.speed)
 
 
 if __name__ == "__main__":
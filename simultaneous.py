@@ -0,0 +1,122 @@
+import hashlib
+from battlefield import DIRECTIONS
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+# Independent random streams per troop and tick
+IDLE_STREAM = 0
+COLLISION_STREAM = 1
+
+# Decision tuple layout, see decide()
+DECISION_FIELDS = ('troop_id', 'action', 'target_id', 'damage', 'original', 'intended', 'cooldown_timer')
+
+
+def _mix64(z):
+    """SplitMix64 finaliser"""
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+
+def counter_seed(seed):
+    """64-bit key for counter_random from any battle seed"""
+    if isinstance(seed, int):
+        return seed & MASK64
+    return int.from_bytes(hashlib.sha256(str(seed).encode('utf-8')).digest()[:8], 'big')
+
+
+def counter_random(key, tick, troop_id, stream):
+    """
+    Random 64-bit integer that depends only on (key, tick, troop_id, stream).
+
+    Unlike a shared RNG stream, the value does not depend on how many draws
+    other troops made first, so troops can decide in any order or in parallel.
+    """
+    z = key
+    for value in (tick, troop_id, stream):
+        z = _mix64(((z ^ value) + GOLDEN_GAMMA) & MASK64)
+    return _mix64((z + GOLDEN_GAMMA) & MASK64)
+
+
+def decide(troop, enemy, distance, key, tick):
+    """
+    Decide one troop's action from the previous tick's state, without changing anything.
+
+    Args:
+        troop: The deciding troop (only read)
+        enemy: Closest enemy within vision range, or None
+        distance: Distance to that enemy
+        key, tick: counter_random inputs for this tick
+
+    Returns:
+        (troop_id, action, target_id, damage, original, intended, cooldown_timer):
+        damage is dealt to target_id, intended is the cell the troop wants to end
+        the tick in, and cooldown_timer is its timer after the tick.
+    """
+    x, y = troop.position
+    cooldown_timer = troop.cooldown_timer
+    damage = 0
+    target_id = None
+    intended = troop.position
+
+    if enemy is None:
+        action = "idle"
+        dx, dy = DIRECTIONS[counter_random(key, tick, troop.id, IDLE_STREAM) % 4]
+        intended = (x + troop.speed * dx, y + troop.speed * dy)
+    elif distance <= troop.attack_range:
+        target_id = enemy.id
+        if cooldown_timer == 0:
+            action = "attacking"
+            cooldown_timer = troop.cooldown + 1
+            damage = troop.attack
+        else:
+            action = "waiting"
+    else:
+        # Same step rule as BattleField.update: each axis moves by speed towards the enemy
+        action = "moving"
+        target_id = enemy.id
+        intended = (x + (troop.speed if enemy.position[0] - x > 0 else -troop.speed),
+                    y + (troop.speed if enemy.position[1] - y > 0 else -troop.speed))
+
+    if cooldown_timer > 0:
+        cooldown_timer -= 1
+    return (troop.id, action, target_id, damage, troop.position, intended, cooldown_timer)
+
+
+def resolve_moves(decisions, key, tick):
+    """
+    Settle where every troop ends the tick.
+
+    Troops that stay put keep their cells. Movers then claim their intended
+    cells in id order, so the lowest id wins a contested cell. A mover that
+    finds its cell taken steps one cell back towards where it came from, on an
+    axis picked by counter_random.
+
+    Returns:
+        {troop_id: final_position}
+    """
+    claimed = {decision[4] for decision in decisions if decision[5] == decision[4]}
+    final = {}
+    for troop_id, _, _, _, original, intended, _ in sorted(decisions, key=lambda decision: decision[0]):
+        if intended == original:
+            final[troop_id] = original
+            continue
+        x, y = intended
+        if intended in claimed:
+            if counter_random(key, tick, troop_id, COLLISION_STREAM) & 1 == 0:
+                x += 1 if original[0] > x else -1
+            else:
+                y += 1 if original[1] > y else -1
+        claimed.add((x, y))
+        final[troop_id] = (x, y)
+    return final
+
+
+def accumulate_damage(decisions):
+    """Total damage dealt to each target this tick: {target_id: damage}"""
+    damage = {}
+    for _, _, target_id, amount, _, _, _ in decisions:
+        if amount:
+            damage[target_id] = damage.get(target_id, 0) + amount
+    return damage
@@ -28,14 +28,31 @@ class SVGRenderer:
         width = self.battlefield.width * scale
         height = self.battlefield.height * scale
         
+        # One viewport per frame, matching what the PNG renderer shows
+        view_boxes = []
+        for frame in self.battlefield.animation_frames:
+            view_x, view_y, view_width, view_height = self.battlefield.get_viewport(scale, self.battlefield.focus_positions(frame))
+            view_boxes.append(f'{view_x * scale} {view_y * scale} {view_width * scale} {view_height * scale}')
+        
         # Create SVG root element
         svg = ET.Element('svg', {
-            'width': str(width),
-            'height': str(height),
+            'width': str(view_width * scale),
+            'height': str(view_height * scale),
             'xmlns': 'http://www.w3.org/2000/svg',
-            'viewBox': f'0 0 {width} {height}'
+            'viewBox': view_boxes[0]
         })
         
+        # Pan the viewport along with the action
+        if len(set(view_boxes)) > 1:
+            total_duration = len(self.battlefield.animation_frames) * frame_duration
+            ET.SubElement(svg, 'animate', {
+                'attributeName': 'viewBox',
+                'values': ';'.join(view_boxes),
+                'dur': f'{total_duration}s',
+                'repeatCount': 'indefinite',
+                'calcMode': 'discrete'
+            })
+        
         # Add background
         ET.SubElement(svg, 'rect', {
             'width': str(width),
@@ -64,12 +81,9 @@ class SVGRenderer:
         return svg_path
     
     def _get_all_troop_ids(self):
-        """Get all unique troop IDs that ever existed in any frame"""
-        all_troop_ids = set()
-        for frame in self.battlefield.animation_frames:
-            for troop in frame['troops']:
-                all_troop_ids.add(troop['id'])
-        return all_troop_ids
+        """Get all troop IDs that ever existed in any frame"""
+        troop_timelines = self.battlefield.get_troop_timelines()[0]
+        return [troop_id for troop_id, timeline in enumerate(troop_timelines) if any(timeline)]
     
     def _add_troop_elements(self, svg, troop_id, scale, frame_duration):
         """Add troop shape, health bar, and animations for a specific troop"""
@@ -115,13 +129,12 @@ class SVGRenderer:
     
     def _get_troop_info(self, troop_id):
         """Get basic troop information from first appearance"""
-        for frame in self.battlefield.animation_frames:
-            for troop in frame['troops']:
-                if troop['id'] == troop_id:
-                    return {
-                        'color': '#0080FF' if troop['team'] == 0 else '#FF4040',
-                        'type': troop['type']
-                    }
+        for troop in self.battlefield.get_troop_timelines()[0][troop_id]:
+            if troop:
+                return {
+                    'color': '#0080FF' if troop['team'] == 0 else '#FF4040',
+                    'type': troop['type']
+                }
         return None
     
     def _svg_to_string(self, svg):
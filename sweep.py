@@ -0,0 +1,348 @@
+import os
+import io
+import csv
+import json
+import random
+import hashlib
+import argparse
+import itertools
+import contextlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from battlefield import BattleField, Troop, BARBARIAN, ARCHER, ENGINE_VERSION, STAGNATION_THRESHOLD
+
+# Order of the values in a troop stat tuple
+STAT_NAMES = ('health', 'attack', 'speed', 'attack_range', 'vision_range', 'cooldown')
+UNIT_TYPES = {'barbarian': BARBARIAN, 'archer': ARCHER}
+
+# Every sweepable parameter and its default; stats are named '<unit>_<stat>'
+DEFAULT_PARAMS = {
+    'width': 100,
+    'height': 100,
+    # Same armies as create_formation_battle in main.py
+    'blue_barbarians': 10,
+    'blue_archers': 8,
+    'red_barbarians': 10,
+    'red_archers': 8,
+}
+for _unit, _stats in UNIT_TYPES.items():
+    for _name, _value in zip(STAT_NAMES, _stats):
+        DEFAULT_PARAMS[f'{_unit}_{_name}'] = _value
+
+
+def grid_design(space):
+    """Expand {param: [values, ...]} into every combination of values"""
+    names = sorted(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def latin_hypercube_design(space, samples, seed=0):
+    """
+    Sample {param: (low, high)} with a Latin hypercube.
+
+    Each parameter's range is split into `samples` strata and every stratum is
+    used exactly once. Integer bounds give integer values.
+    """
+    rng = random.Random(seed)
+    design = [{} for _ in range(samples)]
+    for name in sorted(space):
+        low, high = space[name]
+        strata = list(range(samples))
+        rng.shuffle(strata)
+        for cell, stratum in zip(design, strata):
+            value = low + (stratum + rng.random()) * (high - low) / samples
+            cell[name] = round(value) if isinstance(low, int) and isinstance(high, int) else value
+    return design
+
+
+def resolve_params(params):
+    """Fill in defaults for every parameter a design cell does not set"""
+    unknown = set(params) - set(DEFAULT_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    return {**DEFAULT_PARAMS, **params}
+
+
+def troop_stats(params, unit):
+    """Build the stat tuple for a unit type from resolved parameters"""
+    return tuple(params[f'{unit}_{name}'] for name in STAT_NAMES)
+
+
+def _line_positions(count, x, height, facing):
+    """Spread troops evenly down a column, adding columns behind it when full"""
+    per_column = max(1, height // 2)
+    positions = []
+    for i in range(count):
+        column, row = divmod(i, per_column)
+        rows_in_column = min(per_column, count - column * per_column)
+        y = (row + 1) * height // (rows_in_column + 1)
+        positions.append((x - facing * 2 * column, y))
+    return positions
+
+
+def build_battlefield(params, seed):
+    """Create a formation battle from resolved parameters, like create_formation_battle"""
+    width, height = params['width'], params['height']
+    battlefield = BattleField(width, height, seed=seed)
+
+    # Blue (team True) faces right from the left side, red faces left from the right
+    for team, prefix, facing, front_x, back_x in ((True, 'blue', 1, width // 5, width // 10),
+                                                   (False, 'red', -1, width - width // 5, width - width // 10)):
+        for position in _line_positions(params[f'{prefix}_barbarians'], front_x, height, facing):
+            battlefield.add_troop(Troop(troop_stats(params, 'barbarian'), position, team=team, unit='barbarian'))
+        for position in _line_positions(params[f'{prefix}_archers'], back_x, height, facing):
+            battlefield.add_troop(Troop(troop_stats(params, 'archer'), position, team=team, unit='archer'))
+
+    return battlefield
+
+
+def cell_key(params, replicates, run_options):
+    """Content hash identifying a cell's results on disk"""
+    spec = {
+        'params': params,
+        'replicates': replicates,
+        'run': run_options,
+        'engine': ENGINE_VERSION,
+    }
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def replicate_seed(key, replicate):
+    """Deterministic per-replicate seed derived from the cell key"""
+    return int(hashlib.sha256(f'{key}:{replicate}'.encode('utf-8')).hexdigest()[:15], 16)
+
+
+def result_row(battlefield):
+    """Summarise a finished battle as a flat result row"""
+    outcome = battlefield.outcome
+    blue_health = sum(max(troop.health, 0) for troop in battlefield.troops if troop.team)
+    red_health = sum(max(troop.health, 0) for troop in battlefield.troops if not troop.team)
+    blue_remaining, red_remaining = battlefield.get_team_counts()
+    winner = {True: 'blue', False: 'red'}.get(outcome['winner'], 'none')
+    return {
+        'winner': winner,
+        'reason': outcome['reason'],
+        'predicted': outcome['predicted'],
+        'iterations': outcome['iterations'],
+        'blue_remaining': blue_remaining,
+        'red_remaining': red_remaining,
+        'blue_health': blue_health,
+        'red_health': red_health,
+    }
+
+
+def run_cell(params, replicates, run_options, batched=False):
+    """
+    Run every replicate of one design cell headlessly and return result rows.
+
+    With batched=True all replicates advance together in one BatchedBattles
+    (needs numpy); the results are the same as running them one by one.
+    """
+    key = cell_key(params, replicates, run_options)
+    seeds = [replicate_seed(key, replicate) for replicate in range(replicates)]
+    battlefields = [build_battlefield(params, seed) for seed in seeds]
+
+    if batched:
+        from batch_engine import BatchedBattles
+        BatchedBattles(battlefields).run(**run_options)
+    else:
+        for battlefield in battlefields:
+            # The simulation reports progress on stdout; keep worker output quiet
+            with contextlib.redirect_stdout(io.StringIO()):
+                battlefield.run(render=False, **run_options)
+
+    return [{**params, 'replicate': replicate, 'seed': seed, **result_row(battlefield)}
+            for replicate, (seed, battlefield) in enumerate(zip(seeds, battlefields))]
+
+
+def run_sweep(design, replicates=8, workers=None, cache_dir='sweep_cache', max_iterations=500,
+              stagnation_threshold=STAGNATION_THRESHOLD, predict_confidence=None, batched=False):
+    """
+    Run every cell of a design with seeded headless replicates in parallel.
+
+    Finished cells are written to cache_dir as they complete, so an interrupted
+    sweep picks up where it left off when run again with the same arguments.
+
+    Args:
+        design: List of parameter dicts (see grid_design / latin_hypercube_design)
+        replicates: Number of seeded battles per cell
+        workers: Worker processes (None for one per CPU)
+        cache_dir: Directory for per-cell results (None to disable caching)
+        max_iterations, stagnation_threshold, predict_confidence: Passed to BattleField.run
+        batched: Advance each cell's replicates together with BatchedBattles (needs numpy)
+
+    Returns:
+        Results as columns: {column_name: [value per replicate]}
+    """
+    run_options = {
+        'max_iterations': max_iterations,
+        'stagnation_threshold': stagnation_threshold,
+        'predict_confidence': predict_confidence,
+    }
+    cells = [resolve_params(params) for params in design]
+    results = [None] * len(cells)
+
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def cache_path(params):
+        return os.path.join(cache_dir, f"{cell_key(params, replicates, run_options)}.json")
+
+    pending = []
+    for index, params in enumerate(cells):
+        if cache_dir and os.path.exists(cache_path(params)):
+            with open(cache_path(params), encoding='utf-8') as f:
+                results[index] = json.load(f)
+        else:
+            pending.append(index)
+
+    print(f"Sweep: {len(cells)} cells x {replicates} replicates, {len(cells) - len(pending)} cells cached")
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_cell, cells[index], replicates, run_options, batched): index for index in pending}
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            results[index] = future.result()
+            if cache_dir:
+                # Write then rename so an interrupted sweep never leaves a partial cell
+                path = cache_path(cells[index])
+                with open(path + '.tmp', 'w', encoding='utf-8') as f:
+                    json.dump(results[index], f)
+                os.replace(path + '.tmp', path)
+            print(f"Finished cell {done}/{len(pending)}")
+
+    rows = [row for cell_rows in results for row in cell_rows]
+    names = list(rows[0]) if rows else []
+    return {name: [row[name] for row in rows] for name in names}
+
+
+def apply_branch(battlefield, branch):
+    """
+    Apply one branch's changes to a battlefield restored from a checkpoint.
+
+    'seed' reseeds the battle's RNG (and the per-tick random numbers of
+    simultaneous mode). '<unit>_<stat>' sets that stat on every
+    troop of the unit type; changing health keeps each troop's health ratio.
+    """
+    branch = dict(branch)
+    if 'seed' in branch:
+        battlefield.seed = branch.pop('seed')
+        battlefield.rng = random.Random(battlefield.seed)
+        if battlefield.update_mode == 'simultaneous':
+            from simultaneous import counter_seed
+            battlefield.counter_key = counter_seed(battlefield.seed)
+
+    for name, value in branch.items():
+        unit, _, stat = name.partition('_')
+        if unit not in UNIT_TYPES or stat not in STAT_NAMES:
+            raise ValueError(f"Unknown branch parameter: {name}")
+        for troop in battlefield.troop_registry:
+            if troop.unit != unit:
+                continue
+            if stat == 'health':
+                troop.health = troop.health * value / troop.max_health
+                troop.max_health = value
+            else:
+                setattr(troop, stat, value)
+
+
+def run_branch(checkpoint, branch, run_options):
+    """Play one branch out headlessly from a checkpoint and return its result row"""
+    battlefield = BattleField.from_checkpoint(checkpoint)
+    apply_branch(battlefield, branch)
+    with contextlib.redirect_stdout(io.StringIO()):
+        battlefield.run(render=False, **run_options)
+    return {**branch, **result_row(battlefield)}
+
+
+def run_branches(checkpoint, branches, workers=None, max_iterations=500,
+                 stagnation_threshold=STAGNATION_THRESHOLD, predict_confidence=None):
+    """
+    Fork a checkpoint into one battle per branch and play them out in parallel.
+
+    The ticks before the checkpoint are simulated once, by whoever took it;
+    every branch continues from there. max_iterations counts ticks after the
+    checkpoint.
+
+    Args:
+        checkpoint: BattleField.checkpoint() of the shared prefix
+        branches: List of dicts of changes (see apply_branch), e.g. [{'seed': 1}, {'archer_attack': 40}]
+        workers: Worker processes (None for one per CPU)
+
+    Returns:
+        Results as columns: {column_name: [value per branch]}
+    """
+    run_options = {
+        'max_iterations': max_iterations,
+        'stagnation_threshold': stagnation_threshold,
+        'predict_confidence': predict_confidence,
+    }
+    rows = [None] * len(branches)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(run_branch, checkpoint, branch, run_options): index
+                   for index, branch in enumerate(branches)}
+        for future in as_completed(futures):
+            rows[futures[future]] = future.result()
+
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return {name: [row.get(name) for row in rows] for name in names}
+
+
+def write_table(columns, path):
+    """Write sweep results as Parquet (needs pyarrow) or, for any other extension, CSV"""
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        pq.write_table(pa.table(columns), path)
+        return path
+
+    names = list(columns)
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name] for name in names)))
+    return path
+
+
+def _parse_space(specs, latin_hypercube):
+    """Parse 'param=a,b,c' (grid) or 'param=low:high' (Latin hypercube) arguments"""
+    space = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if latin_hypercube:
+            low, high = (int(value) for value in values.split(':'))
+            space[name] = (low, high)
+        else:
+            space[name] = [int(value) for value in values.split(',')]
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep troop stats and army composition")
+    parser.add_argument('params', nargs='*',
+                        help="Parameters to vary: name=a,b,c for a grid, or name=low:high with --lhs")
+    parser.add_argument('--lhs', type=int, metavar='SAMPLES', help="Latin hypercube with this many samples")
+    parser.add_argument('--design-seed', type=int, default=0, help="Seed for the Latin hypercube")
+    parser.add_argument('--replicates', type=int, default=8)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default='sweep_cache', help="Cache directory for finished cells")
+    parser.add_argument('--max-iterations', type=int, default=500)
+    parser.add_argument('--stagnation-threshold', type=int, default=STAGNATION_THRESHOLD)
+    parser.add_argument('--predict-confidence', type=float, default=None)
+    parser.add_argument('--batched', action='store_true',
+                        help="Run each cell's replicates together in one array pass (needs numpy)")
+    parser.add_argument('--out', default='sweep_results.csv', help="Output table (.csv or .parquet)")
+    args = parser.parse_args()
+
+    space = _parse_space(args.params, args.lhs is not None)
+    if args.lhs is not None:
+        design = latin_hypercube_design(space, args.lhs, args.design_seed)
+    else:
+        design = grid_design(space)
+
+    columns = run_sweep(design, replicates=args.replicates, workers=args.workers, cache_dir=args.cache,
+                        max_iterations=args.max_iterations, stagnation_threshold=args.stagnation_threshold,
+                        predict_confidence=args.predict_confidence, batched=args.batched)
+    print(f"Results saved to {write_table(columns, args.out)}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import csv
+from array import array
+
+# Team value -> column prefix (team True is blue, as in run() and sweep results)
+TEAMS = ((True, 'blue'), (False, 'red'))
+ACTIONS = ('attacking', 'waiting', 'moving', 'idle', 'sleeping')
+TEAM_FIELDS = ('troops', 'health', 'damage', 'deaths') + ACTIONS + ('target_distance',)
+COLUMNS = ('tick',) + tuple(f"{name}_{field}" for _, name in TEAMS for field in TEAM_FIELDS)
+
+
+class TickStats:
+    """
+    Per-tick aggregates collected while a battlefield updates, without any
+    frame recording.
+
+    Each row holds the tick and, per team: troops in the battle, health left,
+    damage dealt, troops killed this tick, troops per action (sleeping troops
+    counted apart from idle ones) and the mean distance from troops to their
+    targets. Damage and deaths are counted as hits land; the rest comes from
+    one pass over the troops at the end of the tick.
+
+    Rows are kept in one flat array of floats (keep=True) and/or streamed to a
+    CSV file at path; call close() to finish the file.
+    """
+
+    def __init__(self, path=None, keep=True):
+        self.columns = COLUMNS
+        self.values = array('d') if keep else None
+        self._file = None
+        self._writer = None
+        if path:
+            self._file = open(path, 'w', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(COLUMNS)
+        self._damage = {True: 0, False: 0}
+        self._deaths = {True: 0, False: 0}
+
+    def __len__(self):
+        return len(self.values) // len(COLUMNS) if self.values is not None else 0
+
+    def hit(self, target, damage):
+        """Record damage just taken by target, dealt by the other team"""
+        self._damage[not target.team] += damage
+        if target.health <= 0 < target.health + damage:
+            self._deaths[target.team] += 1
+
+    def end_tick(self, battlefield):
+        """Add the row for the tick battlefield just finished"""
+        totals = {team: dict.fromkeys(TEAM_FIELDS, 0) for team, _ in TEAMS}
+        targeted = {True: 0, False: 0}
+        for troop in battlefield.troops:
+            team = totals[troop.team]
+            team['troops'] += 1
+            team['health'] += max(troop.health, 0)
+            action = 'sleeping' if troop.id in battlefield.sleeping else getattr(troop, 'action', 'idle')
+            team[action] += 1
+            target = getattr(troop, 'target', None)
+            if target is not None:
+                targeted[troop.team] += 1
+                team['target_distance'] += ((target.position[0] - troop.position[0]) ** 2 +
+                                            (target.position[1] - troop.position[1]) ** 2) ** 0.5
+
+        row = [battlefield.tick]
+        for team, _ in TEAMS:
+            totals[team]['damage'] = self._damage[team]
+            totals[team]['deaths'] = self._deaths[team]
+            if targeted[team]:
+                totals[team]['target_distance'] /= targeted[team]
+            row.extend(totals[team][field] for field in TEAM_FIELDS)
+        self._damage = {True: 0, False: 0}
+        self._deaths = {True: 0, False: 0}
+
+        if self.values is not None:
+            self.values.extend(row)
+        if self._writer is not None:
+            self._writer.writerow(row)
+
+    def rewind(self, tick):
+        """Drop kept rows after tick, as when a battle is restored to a checkpoint"""
+        if self.values is None:
+            return
+        width = len(COLUMNS)
+        keep = len(self)
+        while keep and self.values[(keep - 1) * width] > tick:
+            keep -= 1
+        del self.values[keep * width:]
+        self._damage = {True: 0, False: 0}
+        self._deaths = {True: 0, False: 0}
+
+    def column(self, name):
+        """All kept values of one column, oldest first"""
+        return list(self.values[self.columns.index(name)::len(COLUMNS)])
+
+    def to_array(self):
+        """Kept rows as a (ticks, columns) numpy array"""
+        import numpy as np
+        return np.frombuffer(self.values, dtype=np.float64).reshape(-1, len(COLUMNS)).copy()
+
+    def write_csv(self, path):
+        """Write the kept rows to a CSV file"""
+        width = len(COLUMNS)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(COLUMNS)
+            for start in range(0, len(self.values), width):
+                writer.writerow([int(value) if value.is_integer() else value
+                                 for value in self.values[start:start + width]])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+            self._writer = None
@@ -12,9 +12,9 @@ class TroopAnimator:
         y_values = []
         
         size = int(scale * 0.7)  # Same size calculation as in svg_renderer
+        timeline = self.battlefield.get_troop_timelines()[0][troop_id]
         
-        for frame in self.battlefield.animation_frames:
-            troop_data = self._find_troop_in_frame(frame, troop_id)
+        for troop_data in timeline:
             if troop_data:
                 x = troop_data['position'][0] * scale
                 y = troop_data['position'][1] * scale
@@ -71,9 +71,9 @@ class TroopAnimator:
     def add_visibility_animation(self, element, troop_id, frame_duration):
         """Add visibility animation to show/hide troops when they die"""
         opacity_values = []
+        timeline = self.battlefield.get_troop_timelines()[0][troop_id]
         
-        for frame in self.battlefield.animation_frames:
-            troop_data = self._find_troop_in_frame(frame, troop_id)
+        for troop_data in timeline:
             if troop_data and troop_data['alive']:
                 opacity_values.append('1')
             else:
@@ -88,10 +88,3 @@ class TroopAnimator:
                 'dur': f'{total_duration}s',
                 'repeatCount': 'indefinite'
             })
-    
-    def _find_troop_in_frame(self, frame, troop_id):
-        """Find troop data in a frame by ID"""
-        for troop in frame['troops']:
-            if troop['id'] == troop_id:
-                return troop
-        return None
\ No newline at end of file